@@ -1,43 +1,187 @@
+import os
+import time
+import atexit
+import threading
 import arcpy
+import instrumentation
 
 from credentials import Credentials
-from snowflake.connector import DictCursor
-import snowflake.connector
+
+
+class ConnectionPool(object):
+    """Process-wide pool of warm Snowflake connections.
+
+    Connections are keyed on the credentials file (path and modification
+    time), so every tool run in an ArcGIS Pro session that uses the same file
+    picks up an already authenticated connection instead of logging in."""
+
+    def __init__(self, idle_timeout=15 * 60, health_check_after=60):
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._lock = threading.Lock()
+        self._idle = {}
+        
+        atexit.register(self.close_all)
+
+    def _key(self, path):
+        path = os.path.abspath(path)
+        return (path, os.path.getmtime(path))
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, released):
+        if conn.is_closed():
+            return False
+        if time.time() - released < self.health_check_after:
+            return True
+
+        try:
+            conn.cursor().execute("SELECT 1;")
+            return True
+        except Exception:
+            return False
+
+    def _reap(self):
+        now = time.time()
+        expired = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                expired += [x[0] for x in idle if now - x[1] > self.idle_timeout]
+                idle[:] = [x for x in idle if now - x[1] <= self.idle_timeout]
+
+        for conn in expired:
+            self._close(conn)
+
+    def acquire(self, path):
+        """Return a healthy idle connection for the credentials file, or None."""
+        self._reap()
+        key = self._key(path)
+        
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    return None
+                conn, released = idle.pop()
+
+            if self._healthy(conn, released):
+                return conn
+            self._close(conn)
+
+    def release(self, path, conn, credentials, session_parameters=()):
+        if conn.is_closed():
+            return
+
+        # Tools may switch schema or role; put the session back the way the
+        # credentials file describes it before anyone else gets it. The
+        # current values are read as each is checked, and switching the
+        # database resets the schema, so the schema is then always set.
+        context = [
+            ("ROLE", "role", credentials.role),
+            ("WAREHOUSE", "warehouse", credentials.warehouse),
+            ("DATABASE", "database", credentials.database),
+            ("SCHEMA", "schema", credentials.db_schema)
+        ]
+        try:
+            switched = False
+            for kind, attribute, expected in context:
+                current = getattr(conn, attribute) or ""
+                if expected and (current.upper() != expected.upper() or (kind == "SCHEMA" and switched)):
+                    conn.cursor().execute(f"USE {kind} {expected};")
+                    switched = switched or kind == "DATABASE"
+            # Session parameters set by a tool, e.g. WKB output formats,
+            # would change what the next tool gets back from its queries.
+            if session_parameters:
+                conn.cursor().execute(f"ALTER SESSION UNSET {', '.join(sorted(session_parameters))};")
+        except Exception:
+            self._close(conn)
+            return
+
+        with self._lock:
+            self._idle.setdefault(self._key(path), []).append((conn, time.time()))
+        
+        self._reap()
+
+    def close_all(self):
+        with self._lock:
+            idle = [x[0] for connections in self._idle.values() for x in connections]
+            self._idle = {}
+
+        for conn in idle:
+            self._close(conn)
+
+
+pool = ConnectionPool()
+
 
 class ArcSnow(object):
     def __init__(self, path):
+        self._path = path
         self._credentials = Credentials(path)
         self._conn = None
+        self._session_parameters = set()
         
     def login(self):
+        with instrumentation.stage("login.pooled"):
+            self._conn = pool.acquire(self._path)
+        if self._conn:
+            arcpy.AddMessage("Reusing pooled connection")
+            return
     
-        self._conn = snowflake.connector.connect(
-            user=self._credentials.username,
-            password=self._credentials.rawpass,
-            account=self._credentials.account,
-            role=self._credentials.role,
-            warehouse=self._credentials.warehouse,
-            database=self._credentials.database,
-            db_schema=self._credentials.db_schema
-            )
+        import snowflake.connector
+
+        # The session context is part of the login request, so no USE
+        # statements are needed afterwards.
+        with instrumentation.stage("login"):
+            self._conn = snowflake.connector.connect(
+                user=self._credentials.username,
+                password=self._credentials.rawpass,
+                account=self._credentials.account,
+                role=self._credentials.role,
+                warehouse=self._credentials.warehouse,
+                database=self._credentials.database,
+                schema=self._credentials.db_schema,
+                authenticator=self._credentials.authenticator,
+                paramstyle="qmark",
+                # Let the connector keep its encrypted, locked token cache so SSO
+                # (ID token) and MFA logins resume without prompting in new
+                # processes, and renew the session token while connections idle.
+                client_store_temporary_credential=True,
+                client_request_mfa_token=True,
+                client_session_keep_alive=True
+                )
         
         arcpy.AddMessage("Connection successful")
         
         
         arcpy.AddMessage("\n")
         arcpy.AddMessage("Current configuration")
-        self._conn.cursor().execute(f"USE ROLE {self._credentials.role};")       
         arcpy.AddMessage(f"  Role: {self._credentials.role}")
-        self._conn.cursor().execute(f"USE WAREHOUSE {self._credentials.warehouse};")
         arcpy.AddMessage(f"  Warehouse: {self._credentials.warehouse}")
-        self._conn.cursor().execute(f"USE DATABASE {self._credentials.database}")
         arcpy.AddMessage(f"  Database: {self._credentials.database}")
-        self._conn.cursor().execute(f"USE SCHEMA  {self._credentials.db_schema};")
         arcpy.AddMessage(f"  Schema: {self._credentials.db_schema}")
     
     def logout(self):
-        self._conn.cursor().close()
-        self._conn.close()
+        """Hand the connection back to the pool for the next tool run."""
+        if self._conn is None:
+            return
+        
+        conn = self._conn
+        self._conn = None
+        session_parameters = self._session_parameters
+        self._session_parameters = set()
+        pool.release(self._path, conn, self._credentials, session_parameters)
+
+    def alter_session(self, **parameters):
+        """ALTER SESSION SET the parameters; logout() unsets them again before
+        the connection goes back to the pool."""
+        settings = ", ".join(f"{name} = '{value}'" for name, value in parameters.items())
+        self._conn.cursor().execute(f"ALTER SESSION SET {settings};")
+        self._session_parameters.update(parameters)
         
     def get_schema(self, table_name):
         results = self._conn.cursor().execute("""SELECT COLUMN_NAME, IS_NULLABLE, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION \
@@ -46,6 +190,10 @@ class ArcSnow(object):
         for r in results:
             print(r)
         
+    @property
+    def credentials(self):
+        return self._credentials
+
     @property
     def conn(self):
         return self._conn
@@ -56,7 +204,9 @@ class ArcSnow(object):
         
     @property
     def dict_cursor(self):
-        return self._conn.cursor(snowflake.connector.DictCursor)
+        from snowflake.connector import DictCursor
+
+        return self._conn.cursor(DictCursor)
         
 
 class test_credentials(object):
@@ -85,6 +235,7 @@ class test_credentials(object):
         
         return [credentials, valid]
         
+    @instrumentation.traced
     def execute(self, parameters, messages):
         parameters[1].value = False
         
@@ -94,6 +245,7 @@ class test_credentials(object):
         arcpy.AddMessage(f"Schema: {arcsnow._credentials.db_schema}")
 
         parameters[1].value = True
+        arcsnow.logout()
 
 if __name__ == "__main__":
     arcsnow = ArcSnow("CredentialsFile.ini")
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Seeded synthetic datasets for the benchmark harness."""
+
+import csv
+import math
+import random
+import struct
+import datetime
+
+
+# Column types cycle through these so every width exercises each converter.
+COLUMN_TYPES = ("Integer", "Double", "String", "Date")
+
+_SNOWFLAKE_TYPES = {"Integer": "INT", "Double": "DOUBLE", "String": "VARCHAR", "Date": "DATETIME"}
+_EPOCH = datetime.datetime(2020, 1, 1)
+
+
+def columns(width):
+    """[(name, arcgis field type)] for a table of the given width."""
+    return [(f"COL_{i}", COLUMN_TYPES[i % len(COLUMN_TYPES)]) for i in range(width)]
+
+
+def _value(rng, field_type):
+    if field_type == "Integer":
+        return rng.randint(-1000000, 1000000)
+    if field_type == "Double":
+        return rng.uniform(-1000, 1000)
+    if field_type == "String":
+        return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for x in range(rng.randint(4, 24)))
+    return _EPOCH + datetime.timedelta(seconds=rng.randint(0, 5 * 365 * 86400))
+
+
+def point_wkb(x, y):
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+
+def polygon_wkb(x, y, vertices=16, radius=0.01):
+    ring = [(x + radius * math.cos(2 * math.pi * i / vertices), y + radius * math.sin(2 * math.pi * i / vertices)) for i in range(vertices)]
+    ring.append(ring[0])
+    return struct.pack("<BIII", 1, 3, 1, len(ring)) + b"".join(struct.pack("<dd", *p) for p in ring)
+
+
+def rows(count, width, geometry=None, seed=42):
+    """Yield attribute tuples, with a WKB geometry appended when asked for."""
+    rng = random.Random(seed)
+    types = [x[1] for x in columns(width)]
+
+    for i in range(count):
+        row = tuple(_value(rng, x) for x in types)
+        if geometry:
+            x, y = rng.uniform(-180, 180), rng.uniform(-85, 85)
+            row += (point_wkb(x, y) if geometry == "point" else polygon_wkb(x, y),)
+        yield row
+
+
+def write_csv(path, count, width, seed=42):
+    """Write an attribute-only CSV and return csv_upload field definitions."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([x[0] for x in columns(width)])
+        for row in rows(count, width, seed=seed):
+            writer.writerow([x.strftime("%Y-%m-%d %H:%M:%S") if isinstance(x, datetime.datetime) else x for x in row])
+
+    return [[name, _SNOWFLAKE_TYPES[field_type], 255, True] for name, field_type in columns(width)]
+
+
+def write_dataedo_csv(path, table_name, width, seed=42):
+    """Write a Dataedo column export carrying a comment for every column."""
+    rng = random.Random(seed)
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Database", "Table", "Schema", "Object type", "Position", "Column"] + [f"Attribute {i}" for i in range(6, 15)] + ["Description"])
+        for name, field_type in columns(width):
+            comment = f"{field_type} column {name}, it's {rng.randint(0, 9999)}"
+            writer.writerow(["DB", table_name, "PUBLIC", "Table", "", name] + [""] * 9 + [comment])
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Import-time budget check for the ArcSnow toolbox.
+
+ArcGIS Pro imports ArcSnow.pyt and calls getParameterInfo whenever a tool
+dialog opens, so this times both in fresh interpreters, with the local
+arcpy stand-in already imported as it is inside Pro:
+
+  cold  no compiled bytecode yet, as after installing or updating
+  warm  bytecode cached, as on every later dialog
+
+It also fails if loading the toolbox imported any of the heavy packages
+that must only load inside execute.
+
+    python benchmark/import_time.py --runs 5 --cold-budget-ms 1500 --warm-budget-ms 500
+
+Exits with status 1 when a budget is exceeded."""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import importlib.machinery
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Packages that must not be imported just to show the tools.
+HEAVY = ("pandas", "pyarrow", "numpy", "snowflake", "cryptography", "h3")
+
+
+def run_single():
+    sys.path[:0] = [os.path.join(HERE, "shims"), ROOT]
+    import arcpy
+
+    started = time.perf_counter()
+    toolbox = importlib.machinery.SourceFileLoader("ArcSnow_toolbox", os.path.join(ROOT, "ArcSnow.pyt")).load_module()
+    imported = time.perf_counter()
+
+    for tool in toolbox.Toolbox().tools:
+        tool().getParameterInfo()
+    finished = time.perf_counter()
+
+    return {
+        "import_ms": round(1000 * (imported - started), 2),
+        "parameters_ms": round(1000 * (finished - imported), 2),
+        "heavy": sorted(x for x in HEAVY if x in sys.modules)
+    }
+
+
+def _run(pycache):
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    output = subprocess.run([sys.executable, __file__, "--single"], check=True, stdout=subprocess.PIPE, text=True, env=env).stdout
+    return json.loads(output)
+
+
+def _summary(results):
+    totals = [x["import_ms"] + x["parameters_ms"] for x in results]
+    return {
+        "runs": len(results),
+        "median_ms": round(statistics.median(totals), 2),
+        "max_ms": round(max(totals), 2),
+        "import_ms": round(statistics.median(x["import_ms"] for x in results), 2),
+        "parameters_ms": round(statistics.median(x["parameters_ms"] for x in results), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cold-budget-ms", type=float, default=1500)
+    parser.add_argument("--warm-budget-ms", type=float, default=500)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        json.dump(run_single(), sys.stdout)
+        return
+
+    # Bytecode goes to private folders, so cold runs really compile every
+    # module and the repository's own __pycache__ is never touched.
+    cold, warm = [], []
+    for i in range(args.runs):
+        pycache = tempfile.mkdtemp(prefix="arcsnow_pycache_")
+        try:
+            cold.append(_run(pycache))
+            warm.append(_run(pycache))
+        finally:
+            shutil.rmtree(pycache, ignore_errors=True)
+
+    heavy = sorted(set(x for result in cold + warm for x in result["heavy"]))
+    report = {"cold": _summary(cold), "warm": _summary(warm), "heavy_imports": heavy}
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["cold"]["median_ms"] > args.cold_budget_ms:
+        failures.append(f"cold load takes {report['cold']['median_ms']} ms, budget {args.cold_budget_ms} ms")
+    if report["warm"]["median_ms"] > args.warm_budget_ms:
+        failures.append(f"warm load takes {report['warm']['median_ms']} ms, budget {args.warm_budget_ms} ms")
+    if heavy:
+        failures.append(f"loading the toolbox imports {', '.join(heavy)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
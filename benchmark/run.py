@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmark for the ArcSnow tools.
+
+Runs csv_upload, insert_into, download_query and update_comment against a
+seeded synthetic dataset, with the arcpy and snowflake.connector packages
+replaced by the local stand-ins in benchmark/shims, and reports rows/sec,
+peak memory and the time spent in each stage as JSON.
+
+    python benchmark/run.py --rows 100000 --width 20 --geometry point --threads 4
+
+Every tool runs in its own interpreter so peak memory is measured per tool.
+pandas, pyarrow, numpy and cryptography must be installed."""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import importlib.machinery
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+TOOLS = ("csv_upload", "insert_into", "download_query", "update_comment")
+TABLE_NAME = "BENCH"
+
+
+class Parameter(object):
+    """Just the parts of arcpy.Parameter the execute methods read."""
+
+    def __init__(self, value=None):
+        self.value = value
+        self.values = value if isinstance(value, list) else None
+        self.hasBeenValidated = True
+
+    @property
+    def valueAsText(self):
+        if self.value is None:
+            return None
+        if isinstance(self.value, list):
+            return ";".join(str(x) for x in self.value)
+        return str(self.value)
+
+
+def _setup_path():
+    sys.path[:0] = [os.path.join(HERE, "shims"), ROOT, HERE]
+
+
+def _credentials(folder):
+    from credentials import Credentials
+
+    credentials = Credentials()
+    credentials.location = folder
+    credentials.username = "bench"
+    credentials.password = "bench"
+    credentials.account = "local"
+    credentials.role = "SYSADMIN"
+    credentials.warehouse = "BENCH_WH"
+    credentials.database = "DB"
+    credentials.db_schema = "PUBLIC"
+    credentials.create_cred()
+
+    return credentials.path
+
+
+def _toolbox():
+    return importlib.machinery.SourceFileLoader("ArcSnow_toolbox", os.path.join(ROOT, "ArcSnow.pyt")).load_module()
+
+
+def _source_table(folder, args):
+    import arcpy
+    import datasets
+
+    fields = [arcpy.Field(name, field_type) for name, field_type in datasets.columns(args.width)]
+    geometry_type = {"point": "POINT", "polygon": "POLYGON"}.get(args.geometry)
+    path = os.path.join(folder, "bench.gdb", "SOURCE")
+    arcpy.add_table(path, fields, datasets.rows(args.rows, args.width, geometry_type and args.geometry), geometry_type)
+
+    return path
+
+
+def _snowflake_table(credentials_path, args):
+    """Fill the Snowflake stand-in directly, outside of the measured run."""
+    import arcsnow as asn
+    import datasets
+
+    types = {"Integer": "INT", "Double": "DOUBLE", "String": "VARCHAR", "Date": "DATETIME"}
+    columns = [(name, types[field_type]) for name, field_type in datasets.columns(args.width)]
+    if args.geometry != "none":
+        columns.append(("SHAPE", "GEOGRAPHY"))
+
+    arcsnow = asn.ArcSnow(credentials_path)
+    arcsnow.login()
+    cursor = arcsnow.cursor
+    cursor.execute(f"CREATE TABLE {TABLE_NAME} ({','.join(f'{x} {y}' for x, y in columns)});")
+
+    binds = ",".join("?" for x in columns)
+    rows = [x[:-1] + (x[-1].hex(),) if args.geometry != "none" else x
+            for x in datasets.rows(args.rows, args.width, args.geometry if args.geometry != "none" else None)]
+    cursor.executemany(f"INSERT INTO {TABLE_NAME} VALUES ({binds});", rows)
+    arcsnow.logout()
+
+
+def _prepare(tool, folder, credentials_path, args):
+    """Build the tool and its parameters; none of this is measured."""
+    import datasets
+    import arcsnow as asn
+
+    if tool == "csv_upload":
+        from etl import csv_upload
+
+        csv_path = os.path.join(folder, "bench.csv")
+        field_definitions = datasets.write_csv(csv_path, args.rows, args.width)
+        csv_upload.long_table_name = f'"DB"."PUBLIC"."{TABLE_NAME}"'
+        csv_upload.upload_threads = args.threads
+        parameters = [credentials_path, csv_path, "DB", "PUBLIC", TABLE_NAME, field_definitions,
+                      None, "Replace", None, False, "auto", None, "NONE", None, None, None, False, False]
+        return csv_upload(), [Parameter(x) for x in parameters]
+
+    if tool == "insert_into":
+        from etl import create_table
+
+        in_table = _source_table(folder, args)
+        arcsnow = asn.ArcSnow(credentials_path)
+        arcsnow.login()
+        create_table()._create(arcsnow.cursor, in_table, TABLE_NAME)
+        arcsnow.logout()
+
+        parameters = [credentials_path, in_table, TABLE_NAME, None, args.threads, "Append", None, False, None,
+                      "NONE", None, False, False]
+        return _toolbox().insert_into(), [Parameter(x) for x in parameters]
+
+    if tool == "download_query":
+        from etl import download_query
+
+        _snowflake_table(credentials_path, args)
+        parameters = [credentials_path, f"SELECT * FROM {TABLE_NAME}", os.path.join(folder, "out.gdb"), "DOWNLOAD",
+                      None, True, args.threads, False, False, None, None, None, None, None, None, None, None, None, False, None]
+        return download_query(), [Parameter(x) for x in parameters]
+
+    if tool == "update_comment":
+        from update_column_comment import update_comment
+
+        _snowflake_table(credentials_path, args)
+        csv_path = os.path.join(folder, "dataedo.csv")
+        datasets.write_dataedo_csv(csv_path, TABLE_NAME, args.width)
+
+        instance = update_comment()
+        instance.poll_interval = 0
+        return instance, [Parameter(x) for x in (credentials_path, csv_path, None, None, None, None)]
+
+    raise ValueError(f"Unknown tool {tool}")
+
+
+def _rows(tool, args):
+    # update_comment works per column rather than per row.
+    return args.width if tool == "update_comment" else args.rows
+
+
+def run_single(tool, args):
+    _setup_path()
+
+    import resource
+    import bench_stats
+    import arcpy
+
+    arcpy.VERBOSE = args.verbose
+    folder = tempfile.mkdtemp(prefix="arcsnow_bench_")
+    credentials_path = _credentials(folder)
+    instance, parameters = _prepare(tool, folder, credentials_path, args)
+
+    bench_stats.reset()
+    started = time.perf_counter()
+    instance.execute(parameters, None)
+    seconds = time.perf_counter() - started
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+    stages = {}
+    for name, stage in sorted(bench_stats.stages.items()):
+        stages[name] = {
+            "seconds": round(stage["seconds"], 4),
+            "calls": stage["calls"],
+            "mean_ms": round(1000 * stage["seconds"] / stage["calls"], 4) if stage["calls"] else 0
+        }
+
+    rows = _rows(tool, args)
+    return {
+        "tool": tool,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        "max_rss_mb": round(max_rss_mb, 1),
+        "stages": stages
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--width", type=int, default=20, help="number of attribute columns")
+    parser.add_argument("--geometry", choices=("none", "point", "polygon"), default="point")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=list(TOOLS))
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="print tool messages")
+    parser.add_argument("--single", choices=TOOLS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        json.dump(run_single(args.single, args), sys.stdout)
+        return
+
+    passthrough = ["--rows", str(args.rows), "--width", str(args.width), "--geometry", args.geometry,
+                   "--threads", str(args.threads)] + (["--verbose"] if args.verbose else [])
+
+    results = []
+    for tool in args.tools:
+        output = subprocess.run([sys.executable, __file__, "--single", tool] + passthrough,
+                                check=True, stdout=subprocess.PIPE, text=True).stdout
+        result = json.loads(output)
+        print(f"{tool}: {result['rows']} rows in {result['seconds']}s ({result['rows_per_sec']} rows/s, "
+              f"peak {result['max_rss_mb']} MB)", file=sys.stderr)
+        results.append(result)
+
+    report = {
+        "settings": {"rows": args.rows, "width": args.width, "geometry": args.geometry, "threads": args.threads},
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Minimal in-memory stand-in for arcpy, just enough to drive the ArcSnow
+tools from the benchmark harness without ArcGIS Pro."""
+
+import re
+import sys
+
+from arcpy._gdb import Field, Table, tables, resolve
+from arcpy import da, management, conversion, mp
+
+
+VERBOSE = False
+
+
+class _Env(object):
+    def __init__(self):
+        self.workspace = None
+        self.overwriteOutput = True
+
+
+env = _Env()
+
+
+def AddMessage(message):
+    if VERBOSE:
+        print(message, file=sys.stderr)
+
+
+def AddWarning(message):
+    print(f"WARNING: {message}", file=sys.stderr)
+
+
+def AddError(message):
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+class ExecuteError(Exception):
+    pass
+
+
+class SpatialReference(object):
+    def __init__(self, code=4326):
+        self.factoryCode = code
+        self.name = "GCS_WGS_1984" if code == 4326 else f"EPSG_{code}"
+
+    def exportToString(self):
+        return self.name
+
+
+class _Describe(object):
+    def __init__(self, table):
+        self.OIDFieldName = table.oid_field
+        self.catalogPath = table.path
+        self.dataType = "FeatureClass" if table.shape_field else "Table"
+        self.shapeType = table.geometry_type
+
+
+def Describe(path):
+    return _Describe(resolve(path))
+
+
+def Exists(path):
+    return str(path) in tables
+
+
+def ListFields(path):
+    return list(resolve(path).fields)
+
+
+def ValidateTableName(name, workspace=None):
+    return re.sub(r"\W", "_", name)
+
+
+def ValidateFieldName(name, workspace=None):
+    return re.sub(r"\W", "_", name)
+
+
+def AddFieldDelimiters(workspace, field):
+    return field
+
+
+class _Filter(object):
+    def __init__(self):
+        self.type = None
+        self.list = []
+
+
+class Parameter(object):
+    """Just enough of arcpy.Parameter for getParameterInfo to run."""
+
+    def __init__(self, displayName=None, name=None, datatype=None, parameterType=None, direction=None,
+                 category=None, multiValue=False, enabled=True):
+        self.displayName = displayName
+        self.name = name
+        self.datatype = datatype
+        self.parameterType = parameterType
+        self.direction = direction
+        self.category = category
+        self.multiValue = multiValue
+        self.enabled = enabled
+        self.value = None
+        self.values = None
+        self.columns = []
+        self.filter = _Filter()
+        self.filters = [_Filter() for x in range(8)]
+        self.parameterDependencies = []
+
+
+def add_table(path, fields, rows, geometry_type=None):
+    """Register a source table or feature class for the tools to read."""
+    table = Table(path, geometry_type)
+    table.fields += [x for x in fields if x.type not in ("OID", "Geometry")]
+    if geometry_type:
+        table.fields.append(Field("Shape", "Geometry"))
+    for row in rows:
+        table.append(row)
+
+    tables[path] = table
+    return table
+
+
+__all__ = ["da", "management", "conversion", "mp", "env", "Field"]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""In-memory tables standing in for a geodatabase."""
+
+import re
+
+
+tables = {}
+
+
+class Field(object):
+    def __init__(self, name, type, length=None, isNullable=True, precision=0, scale=0, aliasName=None):
+        self.name = name
+        self.type = type
+        self.length = length
+        self.isNullable = isNullable
+        self.precision = precision
+        self.scale = scale
+        self.aliasName = aliasName or name
+
+
+class Table(object):
+    def __init__(self, path, geometry_type=None, has_z=False):
+        self.path = path
+        self.geometry_type = geometry_type
+        self.has_z = has_z
+        self.oid_field = "OBJECTID"
+        self.fields = [Field("OBJECTID", "OID")]
+        self.rows = []
+        self._next_oid = 1
+
+    @property
+    def shape_field(self):
+        for field in self.fields:
+            if field.type == "Geometry":
+                return field.name
+        return None
+
+    def index(self, token):
+        token = token.upper()
+        if token.startswith("SHAPE@"):
+            token = self.shape_field.upper()
+        elif token == "OID@":
+            token = self.oid_field.upper()
+
+        for i, field in enumerate(self.fields):
+            if field.name.upper() == token:
+                return i
+        raise RuntimeError(f"Cannot find field '{token}' in {self.path}")
+
+    def append(self, values):
+        self.rows.append((self._next_oid,) + tuple(values))
+        self._next_oid += 1
+
+
+def resolve(path):
+    path = str(path)
+    if path not in tables:
+        raise RuntimeError(f"Dataset {path} does not exist")
+
+    return tables[path]
+
+
+_RANGE = re.compile(r"^\s*(\w+)\s*(>=?)\s*(-?\d+)\s+AND\s+\1\s*<=\s*(-?\d+)\s*$", re.I)
+_AFTER = re.compile(r"^\s*(\w+)\s*>\s*(-?\d+)\s*$", re.I)
+
+
+def where_filter(table, where_clause):
+    """Translate the few where clauses the tools build into a row predicate."""
+    if not where_clause:
+        return lambda row: True
+
+    match = _RANGE.match(where_clause)
+    if match:
+        index = table.index(match.group(1))
+        # "> last" is how a checkpointed range continues.
+        low = int(match.group(3)) + (1 if match.group(2) == ">" else 0)
+        high = int(match.group(4))
+        return lambda row: low <= row[index] <= high
+
+    match = _AFTER.match(where_clause)
+    if match:
+        index = table.index(match.group(1))
+        low = int(match.group(2))
+        return lambda row: row[index] > low
+
+    raise NotImplementedError(f"where clause not emulated: {where_clause}")
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+
+from arcpy._gdb import Field, Table, tables
+
+
+def TableToTable(in_rows, out_path, out_name, *args, **kwargs):
+    path = os.path.join(out_path, out_name)
+    table = Table(path)
+
+    with open(in_rows, newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        table.fields += [Field(x, "String", 8000) for x in next(reader)]
+        for row in reader:
+            table.append(row)
+
+    tables[path] = table
+    return path
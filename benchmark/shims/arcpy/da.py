@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import bench_stats
+
+from arcpy._gdb import tables, resolve, where_filter
+
+
+class SearchCursor(object):
+    def __init__(self, in_table, field_names, where_clause=None, spatial_reference=None, explode_to_points=False, sql_clause=(None, None)):
+        table = resolve(in_table)
+        if isinstance(field_names, str):
+            field_names = [field_names]
+
+        self._indexes = [table.index(x) for x in field_names]
+        keep = where_filter(table, where_clause)
+        rows = [x for x in table.rows if keep(x)]
+
+        # Only "ORDER BY <field>" is emulated.
+        if sql_clause and sql_clause[1]:
+            order = table.index(sql_clause[1].split()[-1])
+            rows.sort(key=lambda x: x[order])
+
+        self._rows = iter(rows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = next(self._rows)
+            return tuple(row[i] for i in self._indexes)
+        finally:
+            bench_stats.record("arcpy.search", time.perf_counter() - started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class InsertCursor(object):
+    def __init__(self, in_table, field_names):
+        self._table = resolve(in_table)
+        self._indexes = [self._table.index(x) for x in field_names]
+        self._width = len(self._table.fields) - 1
+
+    def insertRow(self, row):
+        started = time.perf_counter()
+        values = [None] * self._width
+        for index, value in zip(self._indexes, row):
+            values[index - 1] = value
+        self._table.append(values)
+        bench_stats.record("arcpy.insert", time.perf_counter() - started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class UpdateCursor(object):
+    def __init__(self, in_table, field_names, where_clause=None):
+        self._table = resolve(in_table)
+        self._indexes = [self._table.index(x) for x in field_names]
+        self._keep = where_filter(self._table, where_clause)
+        self._position = -1
+        self._deleted = set()
+
+    def __iter__(self):
+        for position, row in enumerate(self._table.rows):
+            if self._keep(row):
+                self._position = position
+                yield [row[i] for i in self._indexes]
+
+        self._table.rows = [x for i, x in enumerate(self._table.rows) if i not in self._deleted]
+
+    def updateRow(self, values):
+        row = list(self._table.rows[self._position])
+        for index, value in zip(self._indexes, values):
+            row[index] = value
+        self._table.rows[self._position] = tuple(row)
+
+    def deleteRow(self):
+        self._deleted.add(self._position)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def TableToNumPyArray(in_table, field_names):
+    import numpy
+
+    table = resolve(in_table)
+    if isinstance(field_names, str):
+        field_names = [field_names]
+
+    indexes = [table.index(x) for x in field_names]
+    dtype = [(x, "i8") for x in field_names]
+    return numpy.array([tuple(row[i] for i in indexes) for row in table.rows], dtype=dtype)
+
+
+def Walk(top, datatype=None):
+    names = [os.path.basename(x) for x in tables if os.path.dirname(x) == top]
+    yield top, [], names
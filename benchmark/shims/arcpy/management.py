@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from arcpy._gdb import Field, Table, tables, resolve
+
+
+_FIELD_TYPES = {
+    "SHORT": "SmallInteger",
+    "LONG": "Integer",
+    "BIGINTEGER": "BigInteger",
+    "FLOAT": "Single",
+    "DOUBLE": "Double",
+    "TEXT": "String",
+    "DATE": "Date",
+    "DATEONLY": "DateOnly",
+    "BLOB": "Blob"
+}
+
+
+class Result(list):
+    def getOutput(self, index):
+        return self[index]
+
+
+def CreateTable(out_path, out_name, *args, **kwargs):
+    path = os.path.join(out_path, out_name)
+    tables[path] = Table(path)
+    return Result([path])
+
+
+def CreateFeatureclass(out_path, out_name, geometry_type="POLYGON", template=None, has_m="DISABLED", has_z="DISABLED", spatial_reference=None, **kwargs):
+    path = os.path.join(out_path, out_name)
+    table = Table(path, geometry_type, has_z == "ENABLED")
+    table.fields.append(Field("Shape", "Geometry"))
+    tables[path] = table
+    return Result([path])
+
+
+def AddFields(in_table, field_description):
+    table = resolve(in_table)
+    for description in field_description:
+        name, field_type = description[0], description[1]
+        length = description[3] if len(description) > 3 else None
+        table.fields.append(Field(name, _FIELD_TYPES[field_type.upper()], length))
+
+    return Result([in_table])
+
+
+def Delete(in_data):
+    tables.pop(str(in_data), None)
+    return Result([in_data])
+
+
+def GetCount(in_rows):
+    return Result([str(len(resolve(in_rows).rows))])
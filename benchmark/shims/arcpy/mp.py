@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+import tempfile
+
+
+class ArcGISProject(object):
+    def __init__(self, path="CURRENT"):
+        self.homeFolder = tempfile.gettempdir()
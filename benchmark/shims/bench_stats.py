@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Timing registry shared by the arcpy and Snowflake stand-ins."""
+
+import time
+import threading
+from contextlib import contextmanager
+
+
+_lock = threading.Lock()
+stages = {}
+
+
+def record(name, seconds, calls=1):
+    with _lock:
+        stage = stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        stage["seconds"] += seconds
+        stage["calls"] += calls
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def reset():
+    with _lock:
+        stages.clear()
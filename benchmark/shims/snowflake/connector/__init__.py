@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for snowflake.connector backed by an in-memory SQLite
+database shared by every connection of the process."""
+
+import time
+
+import bench_stats
+
+from snowflake.connector._backend import Backend
+from snowflake.connector.constants import QueryStatus
+from snowflake.connector.cursor import SnowflakeCursor, DictCursor
+from snowflake.connector.errors import Error, DatabaseError, ProgrammingError
+
+
+paramstyle = "pyformat"
+
+# Simulated authentication round-trip, in seconds.
+LOGIN_LATENCY = 0.0
+
+_backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        _backend = Backend()
+    return _backend
+
+
+def reset():
+    global _backend
+    if _backend is not None:
+        _backend.close()
+    _backend = None
+
+
+class SnowflakeConnection(object):
+    def __init__(self, **kwargs):
+        self._backend = backend()
+        self._results = {}
+        self._closed = False
+        self.role = kwargs.get("role")
+        self.warehouse = kwargs.get("warehouse")
+        self.database = kwargs.get("database")
+        self.schema = kwargs.get("schema")
+
+    def cursor(self, cursor_class=SnowflakeCursor):
+        return cursor_class(self)
+
+    def close(self):
+        self._closed = True
+
+    def is_closed(self):
+        return self._closed
+
+    def get_query_status(self, sfqid):
+        return QueryStatus.FAILED_WITH_ERROR if self._results[sfqid][2] else QueryStatus.SUCCESS
+
+    def get_query_status_throw_if_error(self, sfqid):
+        error = self._results[sfqid][2]
+        if error:
+            raise error
+        return QueryStatus.SUCCESS
+
+    def is_still_running(self, status):
+        return False
+
+    def is_an_error(self, status):
+        return status == QueryStatus.FAILED_WITH_ERROR
+
+
+def connect(**kwargs):
+    with bench_stats.timed("snowflake.connect"):
+        time.sleep(LOGIN_LATENCY)
+        return SnowflakeConnection(**kwargs)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""SQLite engine behind the Snowflake stand-in.
+
+Only the statements the ArcSnow tools issue are understood: plain DDL/DML
+and SELECTs run on SQLite after stripping database/schema qualifiers, PUT
+and COPY INTO emulate a table stage with local files, and column comments
+live in a dictionary that INFORMATION_SCHEMA.COLUMNS is synthesized from.
+Session statements (USE, ALTER SESSION, GRANT, CREATE SCHEMA) are no-ops
+and the session is always in DATABASE.SCHEMA."""
+
+import os
+import re
+import shutil
+import sqlite3
+import datetime
+import tempfile
+import threading
+
+from snowflake.connector.constants import FIELD_NAME_TO_ID
+from snowflake.connector.errors import ProgrammingError
+
+
+_QUALIFIED = re.compile(r'(?:"[^"]*"|\w+)\.(?:"[^"]*"|\w+)\.("[^"]*"|\w+)')
+_COLUMN_DEF = re.compile(r'("[^"]+"|\w+)\s+([A-Za-z_]+)(?:\((\d+)(?:\s*,\s*(\d+))?\))?')
+_COMMENT = re.compile(r"COLUMN\s+(\"[^\"]+\"|\w+)\s+COMMENT\s+'((?:[^'\\]|''|\\.)*)'", re.I)
+_NOOP = ("USE ", "ALTER SESSION", "GRANT ", "CREATE SCHEMA")
+
+# Every benchmark session uses the one database and schema of its credentials.
+DATABASE = "DB"
+SCHEMA = "PUBLIC"
+
+_TYPE_NAMES = {
+    "INT": "FIXED", "INTEGER": "FIXED", "BIGINT": "FIXED", "SMALLINT": "FIXED", "NUMBER": "FIXED", "DECIMAL": "FIXED",
+    "DOUBLE": "REAL", "FLOAT": "REAL", "REAL": "REAL",
+    "VARCHAR": "TEXT", "STRING": "TEXT", "TEXT": "TEXT", "CHAR": "TEXT",
+    "DATE": "DATE",
+    "DATETIME": "TIMESTAMP_NTZ", "TIMESTAMP": "TIMESTAMP_NTZ", "TIMESTAMP_NTZ": "TIMESTAMP_NTZ",
+    "TIMESTAMP_LTZ": "TIMESTAMP_LTZ", "TIMESTAMP_TZ": "TIMESTAMP_TZ",
+    "BOOLEAN": "BOOLEAN", "BINARY": "BINARY",
+    "GEOGRAPHY": "GEOGRAPHY", "GEOMETRY": "GEOMETRY"
+}
+
+
+def _name(identifier):
+    return identifier.strip().strip('"').upper()
+
+
+class Column(object):
+    def __init__(self, type_name, size=None, scale=None):
+        self.type_name = type_name
+        self.size = size
+        self.scale = scale
+
+
+class Backend(object):
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.lock = threading.RLock()
+        self.columns = {}
+        self.comments = {}
+        self.stage_dir = tempfile.mkdtemp(prefix="arcsnow_stage_")
+
+    def close(self):
+        self.db.close()
+        shutil.rmtree(self.stage_dir, ignore_errors=True)
+
+    def _column(self, name, table=None):
+        name = _name(name)
+        if table and name in self.columns.get(table, {}):
+            return self.columns[table][name]
+        for columns in self.columns.values():
+            if name in columns:
+                return columns[name]
+        return None
+
+    def _description(self, cursor, rows, table=None):
+        from snowflake.connector.cursor import ResultMetadata
+
+        description = []
+        for index, item in enumerate(cursor.description or []):
+            column = self._column(item[0], table)
+            if column is None:
+                sample = next((x[index] for x in rows if x[index] is not None), None)
+                if isinstance(sample, int):
+                    column = Column("FIXED", 38, 0)
+                elif isinstance(sample, float):
+                    column = Column("REAL")
+                elif isinstance(sample, bytes):
+                    column = Column("BINARY")
+                else:
+                    column = Column("TEXT")
+
+            if column.type_name == "FIXED":
+                precision, scale, size = column.size or 38, column.scale or 0, None
+            else:
+                precision, scale, size = None, None, column.size or (16777216 if column.type_name == "TEXT" else None)
+
+            description.append(ResultMetadata(item[0], FIELD_NAME_TO_ID[column.type_name], None, size, precision, scale, True))
+
+        return description
+
+    def _convert(self, description, rows):
+        converters = []
+        for column in description:
+            type_name = [k for k, v in FIELD_NAME_TO_ID.items() if v == column.type_code][0]
+            if type_name.startswith("TIMESTAMP"):
+                converters.append(lambda x: datetime.datetime.fromisoformat(x) if isinstance(x, str) else x)
+            elif type_name == "DATE":
+                converters.append(lambda x: datetime.date.fromisoformat(x[:10]) if isinstance(x, str) else x)
+            elif type_name in ("GEOGRAPHY", "GEOMETRY"):
+                converters.append(lambda x: bytes.fromhex(x) if isinstance(x, str) else x)
+            elif type_name == "BOOLEAN":
+                converters.append(lambda x: None if x is None else bool(x))
+            else:
+                converters.append(None)
+
+        if not any(converters):
+            return rows
+        return [tuple(c(v) if c else v for c, v in zip(converters, row)) for row in rows]
+
+    def _create_table(self, sql):
+        match = re.match(r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\"[^\"]+\"|\w+)\s*\((.*)\)\s*$", sql, re.I | re.S)
+        if match:
+            columns = {}
+            for name, type_name, size, scale in _COLUMN_DEF.findall(match.group(2)):
+                base = _TYPE_NAMES.get(type_name.upper())
+                if base:
+                    columns[_name(name)] = Column(base, int(size) if size else None, int(scale) if scale else None)
+            self.columns[_name(match.group(1))] = columns
+
+        self.db.execute(sql)
+        return [], []
+
+    def _put(self, sql):
+        match = re.match(r"PUT\s+'file://(.+?)'\s+(\S+)", sql, re.I)
+        source, stage = match.group(1), match.group(2)
+        target = os.path.join(self.stage_dir, re.sub(r"\W", "_", stage))
+        os.makedirs(target, exist_ok=True)
+        shutil.copy(source, target)
+
+        size = os.path.getsize(source)
+        return [], [(os.path.basename(source), os.path.basename(source), size, size, "NONE", "NONE", "UPLOADED", "")]
+
+    def _copy(self, sql):
+        import pyarrow.parquet as pq
+
+        match = re.match(r"COPY\s+INTO\s+(\S+)\s+FROM\s+(\S+)\s+FILES\s*=\s*\((.*?)\)", sql, re.I | re.S)
+        table, stage = match.group(1), match.group(2)
+        files = [x.strip().strip("'") for x in match.group(3).split(",")]
+        folder = os.path.join(self.stage_dir, re.sub(r"\W", "_", stage))
+
+        results = []
+        for file_name in files:
+            path = os.path.join(folder, file_name)
+            data = pq.read_table(path)
+            columns = ",".join(f'"{x}"' for x in data.column_names)
+            binds = ",".join("?" for x in data.column_names)
+            rows = list(zip(*[x.to_pylist() for x in data.columns]))
+            self.db.executemany(f"INSERT INTO {table} ({columns}) VALUES ({binds})", rows)
+            os.remove(path)
+            results.append((file_name, "LOADED", len(rows), len(rows), 1, 0, None, None, None, None))
+
+        return [], results
+
+    def _information_schema(self):
+        rows = []
+        for (table,) in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            for column in self.db.execute(f'PRAGMA table_info("{table}")').fetchall():
+                key = (table.upper(), column[1].upper())
+                rows.append((SCHEMA, key[0], key[1], self.comments.get(key), "BASE TABLE"))
+
+        from snowflake.connector.cursor import ResultMetadata
+        names = ("TABLE_SCHEMA", "TABLE_NAME", "COLUMN_NAME", "COMMENT", "TABLE_TYPE")
+        description = [ResultMetadata(x, FIELD_NAME_TO_ID["TEXT"], None, 16777216, None, None, True) for x in names]
+        return description, rows
+
+    def _session(self):
+        from snowflake.connector.cursor import ResultMetadata
+        names = ("CURRENT_DATABASE()", "CURRENT_SCHEMA()")
+        description = [ResultMetadata(x, FIELD_NAME_TO_ID["TEXT"], None, 16777216, None, None, True) for x in names]
+        return description, [(DATABASE, SCHEMA)]
+
+    def _comment(self, sql):
+        table = _name(re.match(r"ALTER\s+TABLE\s+(\S+)", sql, re.I).group(1))
+        existing = [x[1].upper() for x in self.db.execute(f'PRAGMA table_info("{table}")').fetchall()]
+
+        changes = _COMMENT.findall(sql)
+        for column, comment in changes:
+            if _name(column) not in existing:
+                raise ProgrammingError(f"invalid identifier '{_name(column)}'")
+
+        for column, comment in changes:
+            self.comments[(table, _name(column))] = comment.replace("''", "'")
+        return [], [("Statement executed successfully.",)]
+
+    def execute(self, sql, params=None):
+        # Checked before qualifiers are stripped from the view names.
+        information_schema = "INFORMATION_SCHEMA.COLUMNS" in sql.upper()
+        sql = _QUALIFIED.sub(r"\1", sql.strip().rstrip(";").strip())
+        keyword = sql.upper()
+
+        with self.lock:
+            try:
+                if keyword.startswith(_NOOP):
+                    return [], [("Statement executed successfully.",)]
+                if keyword.startswith("PUT "):
+                    return self._put(sql)
+                if keyword.startswith("COPY INTO"):
+                    return self._copy(sql)
+                if keyword.startswith("CREATE") and " TABLE " in keyword and " LIKE " not in keyword and " AS " not in keyword:
+                    return self._create_table(sql)
+                if information_schema:
+                    return self._information_schema()
+                if keyword.startswith("SELECT CURRENT_DATABASE()"):
+                    return self._session()
+                if keyword.startswith("ALTER TABLE") and " COMMENT " in keyword:
+                    return self._comment(sql)
+
+                cursor = self.db.execute(sql, params or ())
+                rows = cursor.fetchall()
+            except sqlite3.Error as e:
+                raise ProgrammingError(f"{e}: {sql[:200]}")
+
+            match = re.search(r"\bFROM\s+(\"[^\"]+\"|\w+)", sql, re.I)
+            description = self._description(cursor, rows, _name(match.group(1)) if match else None)
+            return description, self._convert(description, rows)
+
+    def executemany(self, sql, seqparams):
+        sql = _QUALIFIED.sub(r"\1", sql.strip().rstrip(";").strip())
+        with self.lock:
+            try:
+                self.db.executemany(sql, seqparams)
+            except sqlite3.Error as e:
+                raise ProgrammingError(f"{e}: {sql[:200]}")
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+FIELD_ID_TO_NAME = {
+    0: "FIXED",
+    1: "REAL",
+    2: "TEXT",
+    3: "DATE",
+    4: "TIMESTAMP",
+    5: "VARIANT",
+    6: "TIMESTAMP_LTZ",
+    7: "TIMESTAMP_TZ",
+    8: "TIMESTAMP_NTZ",
+    9: "OBJECT",
+    10: "ARRAY",
+    11: "BINARY",
+    12: "TIME",
+    13: "BOOLEAN",
+    14: "GEOGRAPHY",
+    15: "GEOMETRY"
+}
+
+FIELD_NAME_TO_ID = {v: k for k, v in FIELD_ID_TO_NAME.items()}
+
+
+class QueryStatus(object):
+    SUCCESS = "SUCCESS"
+    FAILED_WITH_ERROR = "FAILED_WITH_ERROR"
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import re
+import uuid
+from collections import namedtuple
+
+import bench_stats
+
+from snowflake.connector.constants import FIELD_ID_TO_NAME
+
+
+ResultMetadata = namedtuple("ResultMetadata", ["name", "type_code", "display_size", "internal_size", "precision", "scale", "is_nullable"])
+
+# Rows per result chunk, standing in for the chunks Snowflake serves.
+CHUNK_ROWS = 50000
+
+
+def _kind(command):
+    words = command.strip().split(None, 2)
+    if not words:
+        return "other"
+    if words[0].upper() in ("CREATE", "DROP", "ALTER", "GRANT", "USE"):
+        return "ddl"
+    return words[0].lower()
+
+
+def _arrow_type(column):
+    import pyarrow as pa
+
+    type_name = FIELD_ID_TO_NAME[column.type_code]
+    if type_name == "FIXED":
+        return pa.int64() if not column.scale else pa.float64()
+    if type_name == "REAL":
+        return pa.float64()
+    if type_name == "DATE":
+        return pa.date32()
+    if type_name.startswith("TIMESTAMP"):
+        return pa.timestamp("us")
+    if type_name in ("BINARY", "GEOGRAPHY", "GEOMETRY"):
+        return pa.binary()
+    if type_name == "BOOLEAN":
+        return pa.bool_()
+    return pa.string()
+
+
+def to_arrow(description, rows):
+    import pyarrow as pa
+
+    with bench_stats.timed("snowflake.decode"):
+        columns = list(zip(*rows)) if rows else [[] for x in description]
+        arrays = [pa.array(list(values), type=_arrow_type(column)) for values, column in zip(columns, description)]
+        return pa.Table.from_arrays(arrays, names=[x.name for x in description])
+
+
+class ResultBatch(object):
+    def __init__(self, description, rows):
+        self._description = description
+        self._rows = rows
+        self.rowcount = len(rows)
+
+    def to_arrow(self, connection=None):
+        return to_arrow(self._description, self._rows)
+
+
+class SnowflakeCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.sfqid = None
+        self.rowcount = -1
+        self.arraysize = 1
+        self._rows = []
+        self._index = 0
+
+    def _set_results(self, description, rows):
+        self.description = description
+        self._rows = rows
+        self._index = 0
+        self.rowcount = len(rows)
+
+    def execute(self, command, params=None, **kwargs):
+        self.sfqid = uuid.uuid4().hex
+        with bench_stats.timed(f"snowflake.{_kind(command)}"):
+            description, rows = self.connection._backend.execute(command, params)
+        self._set_results(description, rows)
+        self.connection._results[self.sfqid] = (description, rows, None)
+        return self
+
+    def executemany(self, command, seqparams, **kwargs):
+        seqparams = list(seqparams)
+        self.sfqid = uuid.uuid4().hex
+        with bench_stats.timed("snowflake.executemany"):
+            self.connection._backend.executemany(command, seqparams)
+        self.rowcount = len(seqparams)
+        return self
+
+    def execute_async(self, command, params=None, **kwargs):
+        # Runs at once; the status calls on the connection report the outcome.
+        self.sfqid = uuid.uuid4().hex
+        try:
+            with bench_stats.timed(f"snowflake.{_kind(command)}"):
+                description, rows = self.connection._backend.execute(command, params)
+            self.connection._results[self.sfqid] = (description, rows, None)
+        except Exception as e:
+            self.connection._results[self.sfqid] = ([], [], e)
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid):
+        description, rows, error = self.connection._results[sfqid]
+        if error:
+            raise error
+        self.sfqid = sfqid
+        self._set_results(description, rows)
+
+    def describe(self, command, *args, **kwargs):
+        query = re.sub(r";\s*$", "", command.strip())
+        description, rows = self.connection._backend.execute(f"SELECT * FROM ({query}) LIMIT 0")
+        return description
+
+    def _row(self, row):
+        return row
+
+    def fetchone(self):
+        if self._index >= len(self._rows):
+            return None
+        self._index += 1
+        return self._row(self._rows[self._index - 1])
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows = self._rows[self._index:self._index + size]
+        self._index += len(rows)
+        return [self._row(x) for x in rows]
+
+    def fetchall(self):
+        rows = self._rows[self._index:]
+        self._index = len(self._rows)
+        return [self._row(x) for x in rows]
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def get_result_batches(self):
+        rows = self._rows[self._index:]
+        self._index = len(self._rows)
+        return [ResultBatch(self.description, rows[i:i + CHUNK_ROWS]) for i in range(0, len(rows), CHUNK_ROWS)]
+
+    def fetch_arrow_batches(self):
+        for batch in self.get_result_batches():
+            yield batch.to_arrow()
+
+    def fetch_arrow_all(self):
+        import pyarrow as pa
+
+        tables = list(self.fetch_arrow_batches())
+        return pa.concat_tables(tables) if tables else None
+
+    def close(self):
+        return True
+
+
+class DictCursor(SnowflakeCursor):
+    def _row(self, row):
+        return {column.name: value for column, value in zip(self.description, row)}
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+
+class Error(Exception):
+    def __init__(self, msg=None, sfqid=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.sfqid = sfqid
+
+
+class DatabaseError(Error):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import uuid
+import hashlib
+import tempfile
+import threading
+
+
+DEFAULT_LOCATION = os.path.join(tempfile.gettempdir(), "arcsnow_resume")
+
+# Bytes of a source file hashed into its fingerprint, on top of its size
+# and modification time.
+HEAD_BYTES = 1024 ** 2
+
+MANIFEST_VERSION = "1"
+
+
+def fingerprint(path, **extra):
+    """Identify the state of an upload source; files are fingerprinted by
+    size, modification time and a hash of their first bytes."""
+    source = {"path": os.path.abspath(path) if os.path.exists(path) else path}
+    if os.path.isfile(path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            digest.update(f.read(HEAD_BYTES))
+        stat = os.stat(path)
+        source.update(size=stat.st_size, mtime=stat.st_mtime, head=digest.hexdigest())
+
+    source.update(extra)
+    return source
+
+
+class Manifest(object):
+    """Progress of one upload, saved locally after every step so a failed
+    run can be continued.
+
+    The manifest is found again from the tool, the source fingerprint, the
+    target table and any settings that change what is uploaded, so a rerun
+    with the same inputs resumes and anything else starts over. Uploads
+    record either numbered staged chunks (chunk methods) or ObjectID
+    ranges with the last ObjectID committed in each (range methods).
+
+    Each run that starts over gets a new random run_id, kept in the state,
+    so names derived from it are reused only when the run is resumed."""
+
+    def __init__(self, tool, source, target, settings=None, location=DEFAULT_LOCATION):
+        identity = json.dumps([MANIFEST_VERSION, tool, source, target, settings], sort_keys=True, default=str)
+        self.key = hashlib.sha256(identity.encode()).hexdigest()[:32]
+        self.path = os.path.join(location, f"{self.key}.json")
+        self._location = location
+        self._lock = threading.Lock()
+
+        self.state = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.state = json.load(f)
+            except ValueError:
+                # A manifest cut short by a crash is no checkpoint at all.
+                self.state = {}
+
+        self.resumed = bool(self.state)
+        self.state.setdefault("run_id", uuid.uuid4().hex)
+
+    @property
+    def run_id(self):
+        return self.state["run_id"]
+
+    def save(self):
+        os.makedirs(self._location, exist_ok=True)
+        temp = f"{self.path}.tmp"
+        with open(temp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temp, self.path)
+
+    def get(self, name, default=None):
+        return self.state.get(name, default)
+
+    def set(self, name, value):
+        with self._lock:
+            self.state[name] = value
+            self.save()
+
+    def finish(self):
+        """Forget the upload once it is complete."""
+        self.state = {"run_id": uuid.uuid4().hex}
+        self.resumed = False
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    # Staged chunks
+
+    def add_chunk(self, index, start, rows, file_name):
+        with self._lock:
+            self.state.setdefault("chunks", {})[str(index)] = {"start": start, "rows": rows, "file": file_name, "state": "staged"}
+            self.save()
+
+    def mark_loaded(self, file_names):
+        file_names = set(file_names)
+        with self._lock:
+            for chunk in self.state.get("chunks", {}).values():
+                if chunk["file"] in file_names:
+                    chunk["state"] = "loaded"
+            self.save()
+
+    def completed_chunks(self):
+        """(next index, rows covered, files still to load, stale files) for
+        the unbroken run of chunks from the first one.
+
+        Chunks are staged in parallel, so a failure can leave chunks staged
+        after a missing one; those are dropped and staged again."""
+        chunks = self.state.get("chunks", {})
+        index = 0
+        rows = 0
+        pending = []
+        while str(index) in chunks:
+            chunk = chunks[str(index)]
+            rows += chunk["rows"]
+            if chunk["state"] == "staged":
+                pending.append(chunk["file"])
+            index += 1
+
+        stale = [x["file"] for i, x in chunks.items() if int(i) >= index]
+        if stale:
+            with self._lock:
+                for i in [x for x in chunks if int(x) >= index]:
+                    del chunks[i]
+                self.save()
+
+        return index, rows, pending, stale
+
+    # ObjectID ranges
+
+    def ranges(self):
+        return [(x["low"], x["high"], x["last"], x["rows"]) for x in self.state.get("ranges", [])]
+
+    def set_ranges(self, ranges):
+        self.set("ranges", [{"low": low, "high": high, "last": low - 1, "rows": 0} for low, high in ranges])
+
+    def checkpoint(self, index, last, rows):
+        """Record that range `index` is committed up to ObjectID `last`."""
+        with self._lock:
+            entry = self.state["ranges"][index]
+            entry["last"] = last
+            entry["rows"] += rows
+            self.save()
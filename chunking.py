@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+
+MB = 1024 ** 2
+
+# Parquet codecs Snowflake reads without a FILE_FORMAT COMPRESSION option.
+CODECS = ("snappy", "zstd", "gzip", "none")
+AUTO = "auto"
+
+
+def row_bytes(row):
+    """Rough in-memory size of one row of Python values."""
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value) + 1
+        else:
+            size += 8
+    return size
+
+
+def batch_bytes(rows, sample=100):
+    """Estimated size of a list of rows, from a sample of its first rows."""
+    if not rows:
+        return 0
+    head = rows[:sample]
+    return sum(row_bytes(x) for x in head) * len(rows) // len(head)
+
+
+class AdaptiveChunker(object):
+    """Chunk size, in bytes, tuned from the throughput of earlier chunks.
+
+    The size doubles while throughput keeps improving by more than `gain`,
+    then settles on the best size seen. A chunk slower than `max_seconds`
+    halves the size, since one slow chunk stalls the pipeline and costs the
+    most to retry. With a fixed size (`adaptive=False`) it only measures."""
+
+    def __init__(self, size=4 * MB, min_size=256 * 1024, max_size=256 * MB, max_seconds=60, gain=1.1, adaptive=True):
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_seconds = max_seconds
+        self.gain = gain
+        self.adaptive = adaptive
+        self.settled = not adaptive
+        self.chunks = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self._best = None
+        self._lock = threading.Lock()
+
+    def rows(self, average_row_bytes):
+        """Rows per chunk for rows of the given average size."""
+        return max(1, int(self.size // max(average_row_bytes, 1)))
+
+    def observe(self, nbytes, seconds):
+        with self._lock:
+            self.chunks += 1
+            self.bytes += nbytes
+            self.seconds += seconds
+            if not self.adaptive or seconds <= 0:
+                return
+
+            if seconds > self.max_seconds:
+                self.size = max(self.size // 2, self.min_size)
+                self.settled = True
+                return
+            if self.settled:
+                return
+
+            # Only chunks near the current size say anything about it.
+            if nbytes < self.size // 2:
+                return
+
+            throughput = nbytes / seconds
+            if self._best is None or throughput > self._best[1] * self.gain:
+                self._best = (self.size, throughput)
+                if self.size >= self.max_size:
+                    self.settled = True
+                self.size = min(self.size * 2, self.max_size)
+            else:
+                self.size = self._best[0]
+                self.settled = True
+
+    def summary(self):
+        throughput = self.bytes / self.seconds / MB if self.seconds else 0
+        state = "settled" if self.settled else "still adapting"
+        return f"chunk size {self.size / MB:.2f} MB ({state}), {self.chunks} chunks at {throughput:.1f} MB/s"
+
+
+class CodecChooser(object):
+    """Parquet codec for the next chunk.
+
+    With `codec` set to "auto", chunks are compressed with snappy until the
+    upload of a chunk takes more than `ratio` times as long as encoding it;
+    the link is then the bottleneck and the denser zstd is worth its extra
+    CPU."""
+
+    def __init__(self, codec=AUTO, ratio=2.0):
+        self.auto = codec == AUTO
+        self.codec = "snappy" if self.auto else codec
+        self.ratio = ratio
+
+    def observe(self, encode_seconds, upload_seconds):
+        if self.auto:
+            self.codec = "zstd" if upload_seconds > self.ratio * encode_seconds else "snappy"
+
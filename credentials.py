@@ -3,7 +3,6 @@ import os
 import ctypes
 import arcpy
 
-from cryptography.fernet import Fernet
 
 class Credentials(object):
     def __init__(self, path=None):
@@ -23,6 +22,7 @@ class Credentials(object):
         self.warehouse = ""
         self.database = ""
         self.db_schema = ""
+        self.authenticator = "snowflake"
         #File names and decyrption key
 
 
@@ -32,6 +32,8 @@ class Credentials(object):
 
     @password.setter
     def password(self, password):
+        from cryptography.fernet import Fernet
+
         self.__key = Fernet.generate_key()
         f = Fernet(self.__key)
         self.__password = f.encrypt(password.encode()).decode()
@@ -39,6 +41,8 @@ class Credentials(object):
         
     @property
     def rawpass(self):
+        from cryptography.fernet import Fernet
+
         f = Fernet(self.__key)
         decrypted = f.decrypt(self.__password.encode()).decode()
         del f
@@ -54,7 +58,7 @@ class Credentials(object):
         key_filename = os.path.join(self.location, self.__key_file)
 
         with open(cred_filename, 'w') as file_in:
-            file_in.write(f"#Credential File:\nUsername={self.username}\nPassword={self.__password}\nAccount={self.account}\nRole={self.role}\nWarehouse={self.warehouse}\nDatabase={self.database}\nSchema={self.db_schema}")
+            file_in.write(f"#Credential File:\nUsername={self.username}\nPassword={self.__password}\nAccount={self.account}\nRole={self.role}\nWarehouse={self.warehouse}\nDatabase={self.database}\nSchema={self.db_schema}\nAuthenticator={self.authenticator}")
 
         if(os.path.exists(key_filename)):
             os.remove(key_filename)
@@ -81,29 +85,25 @@ class Credentials(object):
             with open(key_file, 'r') as key_in:
                     self.__key = key_in.read().encode()
 
-            #Sets the value of decrpytion key    
-            f = Fernet(self.__key)
-
             #Loops through each line of file to populate a dictionary from tuples in the form of key=value
             with open(cred_filename, 'r') as cred_in:
                 lines = cred_in.readlines()
                 config = {}
                 for line in lines:
                     tuples = line.rstrip('\n').split('=',1)
-                    if tuples[0] in ('Username', 'Password', 'Account', 'Role', 'Warehouse', 'Database', 'Schema'):
+                    if tuples[0] in ('Username', 'Password', 'Account', 'Role', 'Warehouse', 'Database', 'Schema', 'Authenticator'):
                         config[tuples[0]] = tuples[1]
 
-                #Password decryption
-                passwd = f.decrypt(config['Password'].encode()).decode()
-                config['Password'] = passwd
-                
+                #The password stays encrypted with the key file's key and is only
+                #decrypted by rawpass when a connection is actually opened
                 self.username = config['Username']
-                self.password = config['Password']
+                self.__password = config['Password']
                 self.account = config['Account']
                 self.role = config['Role']
                 self.warehouse = config['Warehouse']
                 self.database = config['Database']
                 self.db_schema = config['Schema']
+                self.authenticator = config.get('Authenticator', 'snowflake')
             return True
             
         except:
@@ -192,10 +192,22 @@ class generate_credentials(object):
             datatype = "DEFile",
             parameterType = "Derived",
             direction = "Output")
+
+        # 9
+        authenticator = arcpy.Parameter(
+            displayName="Authenticator",
+            name="authenticator",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        authenticator.filter.type = "ValueList"
+        authenticator.filter.list = ["snowflake", "externalbrowser", "username_password_mfa"]
+        authenticator.value = "snowflake"
          
         output_path.value = arcpy.mp.ArcGISProject("CURRENT").homeFolder
 
-        return [username, password, account, role, warehouse, database, db_schema, output_path, out_file]
+        return [username, password, account, role, warehouse, database, db_schema, output_path, out_file, authenticator]
 
     def updateParameters(self, parameters):
         if not parameters[7].value:
@@ -217,6 +229,7 @@ class generate_credentials(object):
         credentials.database = parameters[5].valueAsText
         credentials.db_schema = parameters[6].valueAsText
         credentials.location = parameters[7].valueAsText
+        credentials.authenticator = parameters[9].valueAsText or "snowflake"
         
         credentials.create_cred()
         
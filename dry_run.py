@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from gdb_writer import SPATIAL_TYPES, field_spec
+from snowflake.connector.constants import FIELD_ID_TO_NAME
+from snowflake.connector.errors import ProgrammingError
+
+
+# Results past either size get a warning before the tool is run.
+LARGE_BYTES = 1024 ** 3
+LARGE_ROWS = 5000000
+
+# Semi-structured values are written to the geodatabase as JSON text.
+TEXT_TYPES = ("VARIANT", "OBJECT", "ARRAY")
+
+
+def _unquote(name):
+    return name.strip('"').replace('""', '"')
+
+
+class QueryPreview(object):
+    """What a query would return, found without running it.
+
+    The schema comes from describing the query and the size from its
+    EXPLAIN plan, which are both compiled by the cloud services layer and
+    use no warehouse time. The plan gives the bytes and partitions left
+    after pruning; rows are estimated from the row counts of the scanned
+    tables, scaled by the share of their partitions that are read. Row
+    counts come from SHOW TABLES, which reads metadata and also runs
+    without a warehouse."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.columns = []
+        self.bytes = None
+        self.rows = None
+        self.partitions = None
+        self.warnings = []
+
+    def load(self, cursor, sql):
+        query = sql.strip().rstrip(";").strip()
+        try:
+            description = cursor.describe(query)
+        except ProgrammingError as e:
+            self.error = e.msg or str(e)
+            return self
+
+        spatial = 0
+        for column in description:
+            type_name = FIELD_ID_TO_NAME[column.type_code]
+            field_type, length = field_spec(column)
+            if type_name in SPATIAL_TYPES:
+                spatial += 1
+                field_type = "Shape" if spatial == 1 else field_type
+            self.columns.append([column.name, type_name, field_type if length is None else f"{field_type}({length})"])
+            if type_name in TEXT_TYPES:
+                self.warnings.append(f"{column.name} ({type_name}) is written as JSON text")
+
+        if spatial > 1:
+            self.warnings.append("Only the first spatial column becomes the shape; the others are kept as WKB blobs")
+
+        try:
+            self._estimate(cursor, query)
+        except ProgrammingError:
+            # Some statements, e.g. SHOW, can be described but not explained.
+            pass
+
+        if self.bytes and self.bytes > LARGE_BYTES:
+            self.warnings.append(f"The query reads about {self.bytes / 1024 ** 3:,.1f} GB after pruning")
+        if self.rows and self.rows > LARGE_ROWS:
+            self.warnings.append(f"The query may return up to {self.rows:,} rows")
+
+        return self
+
+    def _estimate(self, cursor, query):
+        plan = json.loads(cursor.execute(f"EXPLAIN USING JSON {query}").fetchone()[0])
+        stats = plan.get("GlobalStats", {})
+        self.bytes = stats.get("bytesAssigned")
+        if stats.get("partitionsTotal") is not None:
+            self.partitions = (stats.get("partitionsAssigned"), stats.get("partitionsTotal"))
+
+        rows = 0
+        for operation in plan.get("Operations", [[]])[0]:
+            if operation.get("operation") != "TableScan" or not operation.get("partitionsTotal"):
+                continue
+            for name in operation.get("objects", []):
+                count = self._table_rows(cursor, name)
+                if count is None:
+                    return
+                rows += count * operation.get("partitionsAssigned", 0) // operation["partitionsTotal"]
+
+        self.rows = rows
+
+    def _table_rows(self, cursor, name):
+        parts = [_unquote(x) for x in name.split(".")]
+        if len(parts) != 3:
+            return None
+
+        database, schema = [x.replace('"', '""') for x in parts[:2]]
+        table = parts[2]
+        # LIKE is case-insensitive and treats _ as a wildcard, so the name
+        # is matched exactly below.
+        pattern = table.replace("'", "''")
+        cursor.execute(f"SHOW TABLES LIKE '{pattern}' IN SCHEMA \"{database}\".\"{schema}\";")
+        columns = [column.name.lower() for column in cursor.description]
+        for row in cursor.fetchall():
+            if row[columns.index("name")] == table:
+                return row[columns.index("rows")]
+        return None
+
+    def summary(self):
+        parts = [f"{len(self.columns)} columns"]
+        if self.rows is not None:
+            parts.append(f"up to {self.rows:,} rows")
+        if self.bytes is not None:
+            parts.append(f"{self.bytes / 1024 ** 2:,.1f} MB scanned")
+        if self.partitions:
+            parts.append(f"{self.partitions[0]:,} of {self.partitions[1]:,} partitions")
+        return ", ".join(parts)
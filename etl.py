@@ -5,13 +5,28 @@ import csv
 import arcpy
 from arcpy.arcobjects.arcobjects import Schema
 import arcsnow as asn
-import pandas as pd
+import instrumentation
 import tempfile
+import time
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-# The Snowflake Connector library.
-import snowflake.connector as snow
-from snowflake.connector.pandas_tools import write_pandas
+# ArcGIS Pro imports the toolbox whenever a tool dialog opens, so only
+# modules that load quickly are imported here. pandas, pyarrow, the
+# Snowflake connector and the modules built on them (gdb_writer,
+# result_cache, staging, lod, dry_run, watermark) are imported by the
+# methods that use them.
+from incremental import IncrementalSync, HASH_COLUMN
+from tiling import DEFAULT_TILE_DEGREES, geometry_srid, spatial_column, tile_grid, tile_sql
+from chunking import AUTO, CODECS, MB, AdaptiveChunker, CodecChooser
+from checkpoint import Manifest, fingerprint
+from spatial_index import CELL_COLUMN, SCHEMES, CellKey, column_sql, guess_lat_lon, prepare_sql, recluster_sql
+from type_inference import FIELD_TYPES, DEFINITION_TYPES, TIMESTAMP_FORMATS, TRUE_VALUES, FALSE_VALUES, arrow_type, definition_column, field_column, infer_column
+
+
+def _arrow_size(table):
+    return table.num_rows, table.nbytes
 
 
 
@@ -62,30 +77,239 @@ class download_query(object):
             datatype="DETable",
             parameterType="Derived",
             direction="Output")
+
+        # 5
+        stream = arcpy.Parameter(
+            displayName="Stream Arrow Batches",
+            name="stream",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        stream.value = True
+
+        # 6
+        fetch_threads = arcpy.Parameter(
+            displayName="Fetch Threads",
+            name="fetch_threads",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        fetch_threads.value = 4
+
+        # 7
+        use_cache = arcpy.Parameter(
+            displayName="Use Local Result Cache",
+            name="use_cache",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        use_cache.value = True
+
+        # 8
+        refresh_cache = arcpy.Parameter(
+            displayName="Refresh Cached Result",
+            name="refresh_cache",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        refresh_cache.value = False
+
+        # 9
+        spatial_reference = arcpy.Parameter(
+            displayName="GEOMETRY Spatial Reference",
+            name="spatial_reference",
+            datatype="GPSpatialReference",
+            parameterType="Optional",
+            direction="Input")
+
+        spatial_reference.value = arcpy.SpatialReference(4326).exportToString()
+
+        # 10 - "Current Display Extent" gives the extent of the active map
+        extent = arcpy.Parameter(
+            displayName="Spatial Extent",
+            name="extent",
+            datatype="GPExtent",
+            parameterType="Optional",
+            direction="Input")
+
+        # 11
+        tile_size = arcpy.Parameter(
+            displayName="Tile Size (Degrees)",
+            name="tile_size",
+            datatype="GPDouble",
+            parameterType="Optional",
+            direction="Input")
+
+        tile_size.value = DEFAULT_TILE_DEGREES
+
+        # 12
+        spatial_column = arcpy.Parameter(
+            displayName="Spatial Filter Column",
+            name="spatial_column",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+        
+        # 13
+        lod_scales = arcpy.Parameter(
+            displayName="Simplify For Map Scales (1:n)",
+            name="lod_scales",
+            datatype="GPDouble",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
+        # 14
+        lod_tolerance = arcpy.Parameter(
+            displayName="Simplification Tolerance (Meters)",
+            name="lod_tolerance",
+            datatype="GPDouble",
+            parameterType="Optional",
+            direction="Input")
+
+        # 15
+        lod_tables = arcpy.Parameter(
+            displayName="Level Of Detail Tables",
+            name="lod_tables",
+            datatype="DETable",
+            parameterType="Derived",
+            direction="Output",
+            multiValue=True)
+
+        # 16 - a timestamp or sequence column that grows with new rows
+        sync_column = arcpy.Parameter(
+            displayName="Sync On Watermark Column",
+            name="sync_column",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        # 17 - empty to only append
+        sync_keys = arcpy.Parameter(
+            displayName="Sync Key Fields",
+            name="sync_keys",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
+        # 18
+        reset_sync = arcpy.Parameter(
+            displayName="Download Again In Full",
+            name="reset_sync",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        reset_sync.value = False
+
+        # 19 - filled in while the query is validated
+        result_schema = arcpy.Parameter(
+            displayName="Result Schema",
+            name="result_schema",
+            datatype="GPValueTable",
+            parameterType="Optional",
+            direction="Input",
+            enabled=False)
+
+        result_schema.columns = [["GPString", "Column"], ["GPString", "Snowflake Type"], ["GPString", "Output Field"]]
         
-        return [credentials, sql_query, out_database, out_name, out_table]
+        return [credentials, sql_query, out_database, out_name, out_table, stream, fetch_threads, use_cache, refresh_cache, spatial_reference,
+                extent, tile_size, spatial_column, lod_scales, lod_tolerance, lod_tables, sync_column, sync_keys, reset_sync, result_schema]
+
+    # Query previews by credentials and SQL text, kept for the session so
+    # validation only goes to Snowflake when either changes. Failed logins
+    # are kept by credentials alone and only retried once the credentials
+    # file is saved again.
+    _previews = {}
+    _failed_logins = {}
+
+    def _credentials_key(self, parameters):
+        credentials_path = parameters[0].valueAsText
+        try:
+            return credentials_path, os.path.getmtime(credentials_path)
+        except OSError:
+            return credentials_path, None
+
+    def _preview_key(self, parameters):
+        from result_cache import normalize_sql
+
+        if not parameters[0].valueAsText or not parameters[1].valueAsText:
+            return None
+        return self._credentials_key(parameters) + (normalize_sql(parameters[1].valueAsText),)
+
+    def _preview(self, parameters):
+        from dry_run import QueryPreview
+
+        key = self._preview_key(parameters)
+        if key is None:
+            return None
+        if key in download_query._previews:
+            return download_query._previews[key]
+
+        preview = QueryPreview()
+        credentials = key[:2]
+        if credentials in download_query._failed_logins:
+            preview.warnings.append(download_query._failed_logins[credentials])
+        else:
+            arcsnow = asn.ArcSnow(parameters[0].valueAsText)
+            try:
+                arcsnow.login()
+            except Exception as e:
+                download_query._failed_logins[credentials] = f"Could not check the query: {e}"
+                preview.warnings.append(download_query._failed_logins[credentials])
+            else:
+                try:
+                    preview.load(arcsnow.cursor, parameters[1].valueAsText)
+                except Exception as e:
+                    preview.warnings.append(f"Could not check the query: {e}")
+                finally:
+                    arcsnow.logout()
+
+        download_query._previews[key] = preview
+        return preview
     
     def updateParameters(self, parameters):
         """Modify the values and properties of parameters before internal
         validation is performed.  This method is called whenever a parameter
         has been changed."""
+
+        # Describe the query without running it whenever it changes.
+        if not parameters[0].hasBeenValidated or not parameters[1].hasBeenValidated:
+            preview = self._preview(parameters)
+            parameters[19].values = preview.columns if preview else []
         
         return
 
-    def execute(self, parameters, messages):
-        sql_query = parameters[1].valueAsText
-        out_database = parameters[2].valueAsText
-        out_name = parameters[3].valueAsText
-        
-        arcsnow = asn.ArcSnow(parameters[0].valueAsText)
-        arcsnow.login()
+    def updateMessages(self, parameters):
+        """Modify the messages created by internal validation for each tool
+        parameter.  This method is called after internal validation."""
+        # updateParameters has already fetched the preview for this pass.
+        preview = download_query._previews.get(self._preview_key(parameters))
+        if preview is None:
+            return
+
+        if preview.error:
+            parameters[1].setErrorMessage(preview.error)
+        elif preview.warnings:
+            summary = [preview.summary()] if preview.columns else []
+            parameters[1].setWarningMessage("\n".join(summary + preview.warnings))
+
+        return
+
+    def _download_csv(self, arcsnow, sql_query, out_database, out_name):
+        with instrumentation.stage("query"):
+            results = arcsnow.dict_cursor.execute(sql_query)
+        instrumentation.query("query", results)
 
-        arcpy.AddMessage(sql_query)
-        results = arcsnow.dict_cursor.execute(sql_query)
         first = results.fetchone()
         file_name = os.path.join(tempfile.gettempdir(), 'test.csv')
         
-        with open(file_name, 'w', newline='') as csvfile:
+        with open(file_name, 'w', newline='') as csvfile, instrumentation.stage("fetch.csv") as timer:
             fields = list(first.keys())
             arcpy.AddMessage(fields)
             writer = csv.DictWriter(csvfile, fieldnames=fields)
@@ -94,26 +318,489 @@ class download_query(object):
             
             for record in results:
                 writer.writerow(record)
+            timer.add(results.rowcount, csvfile.tell())
         
         arcpy.AddMessage("Converting CSV to database table")
-        parameters[4].value = arcpy.conversion.TableToTable(file_name, out_database, out_name)
+        with instrumentation.stage("TableToTable"):
+            return arcpy.conversion.TableToTable(file_name, out_database, out_name)
+
+    def _fetch_batches(self, cursor, threads):
+        # Each batch is one result chunk as served by Snowflake, so memory
+        # stays bounded by the chunk size rather than the result size.
+        if threads <= 1:
+            yield from cursor.fetch_arrow_batches()
+            return
+
+        # Result chunks are independent downloads. Fetch and decode them on a
+        # pool, keeping at most two per thread in flight, and hand them back
+        # in result order so the single writer sees the rows as queried.
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            pending = deque()
+            for batch in cursor.get_result_batches():
+                pending.append(pool.submit(batch.to_arrow))
+                if len(pending) >= threads * 2:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def _download_cached(self, entry, out_database, out_name, spatial_reference=None):
+        from gdb_writer import GDBWriter
+
+        arcpy.AddMessage("Using cached result")
+        try:
+            writer = GDBWriter(out_database, out_name, entry.description, spatial_reference)
+            for batch in instrumentation.iterate("cache.read", entry.batches(), _arrow_size):
+                writer.write(batch)
+        finally:
+            entry.close()
+
+        arcpy.AddMessage(f"Wrote {writer.rows} rows to {writer.path}")
+        return writer.close()
+
+    def _discard_cache(self, cache_writer, error=None):
+        if error is not None:
+            arcpy.AddWarning(f"The result is not cached: {error}")
+        try:
+            cache_writer.discard()
+        except Exception:
+            pass
+
+    def _cache_write(self, cache_writer, table):
+        """Add a batch to the result cache, which is best effort: on any
+        error, e.g. a full disk, the entry is dropped and None returned so
+        the download carries on uncached."""
+        try:
+            with instrumentation.stage("cache.write"):
+                cache_writer.write(table)
+        except Exception as e:
+            self._discard_cache(cache_writer, e)
+            return None
+        return cache_writer
+
+    def _download_stream(self, arcsnow, sql_query, out_database, out_name, threads=1, cache=None, key=None, spatial_reference=None):
+        from gdb_writer import GDBWriter
+
+        cursor = arcsnow.cursor
+
+        # Spatial columns arrive as binary WKB, which the writer hands to the
+        # insert cursor as shapes without any text parsing.
+        arcsnow.alter_session(GEOGRAPHY_OUTPUT_FORMAT='WKB', GEOMETRY_OUTPUT_FORMAT='WKB')
+        with instrumentation.stage("query"):
+            cursor.execute(sql_query)
+        instrumentation.query("query", cursor)
+
+        writer = GDBWriter(out_database, out_name, cursor.description, spatial_reference)
+        arcpy.AddMessage([x.name for x in cursor.description])
+
+        cache_writer = cache.writer(key, cursor.description) if cache else None
+        try:
+            for table in instrumentation.iterate("fetch", self._fetch_batches(cursor, threads), _arrow_size):
+                writer.write(table)
+                if cache_writer:
+                    cache_writer = self._cache_write(cache_writer, table)
+        except Exception:
+            if cache_writer:
+                self._discard_cache(cache_writer)
+            raise
+
+        if cache_writer:
+            try:
+                cache_writer.commit()
+            except Exception as e:
+                self._discard_cache(cache_writer, e)
+
+        arcpy.AddMessage(f"Wrote {writer.rows} rows to {writer.path}")
+        return writer.close()
+
+    def _fetch_tile(self, arcsnow, cache, sql, refresh=False):
+        """Return the cache entry holding one tile, querying it if needed."""
+        key = cache.key(sql, arcsnow.credentials)
+        entry = None if refresh else cache.get(key)
+        if entry:
+            return entry
+
+        with instrumentation.stage("tile.query"):
+            cursor = arcsnow.conn.cursor()
+            cursor.execute(sql)
+        instrumentation.query("tile.query", cursor)
+
+        cache_writer = cache.writer(key, cursor.description)
+        try:
+            for table in instrumentation.iterate("tile.fetch", cursor.fetch_arrow_batches(), _arrow_size):
+                cache_writer.write(table)
+        except Exception:
+            cache_writer.discard()
+            raise
+        cache_writer.commit()
+
+        entry = cache.get(key)
+        if entry is None:
+            raise ValueError("A tile result is larger than the result cache")
+        return entry
+
+    def _download_tiles(self, arcsnow, sql_query, out_database, out_name, extent, tile_size, column_name=None,
+                        threads=1, refresh=False, spatial_reference=None):
+        from gdb_writer import GDBWriter
+        from result_cache import ResultCache
+
+        cursor = arcsnow.cursor
+        arcsnow.alter_session(GEOGRAPHY_OUTPUT_FORMAT='WKB', GEOMETRY_OUTPUT_FORMAT='WKB')
+
+        description = cursor.describe(sql_query)
+        column, type_name = spatial_column(description, column_name)
+        srid = geometry_srid(cursor, sql_query, column) if type_name == "GEOMETRY" else 4326
+
+        # Tiles live on a lon/lat grid whatever the map's coordinate system.
+        if extent.spatialReference and extent.spatialReference.factoryCode != 4326:
+            extent = extent.projectAs(arcpy.SpatialReference(4326))
+        tiles = tile_grid(extent.XMin, extent.YMin, extent.XMax, extent.YMax, tile_size)
+        if not tiles:
+            raise ValueError("The extent covers no tiles")
+        arcpy.AddMessage(f"Filtering {column} ({type_name}, SRID {srid}) with {len(tiles)} tiles of {tile_size} degrees")
+
+        cache = ResultCache()
+        writer = GDBWriter(out_database, out_name, description, spatial_reference)
+
+        # Tiles are fetched into the local cache in parallel and written to
+        # the output in grid order, at most two per thread ahead.
+        with ThreadPoolExecutor(max_workers=max(threads, 1)) as pool:
+            pending = deque()
+            tiles = iter(tiles)
+            while True:
+                for bounds in tiles:
+                    sql = tile_sql(sql_query, column, type_name, bounds, tile_size, srid)
+                    pending.append(pool.submit(self._fetch_tile, arcsnow, cache, sql, refresh))
+                    if len(pending) >= threads * 2:
+                        break
+                if not pending:
+                    break
+
+                entry = pending.popleft().result()
+                try:
+                    for batch in entry.batches():
+                        writer.write(batch)
+                finally:
+                    entry.close()
+
+        arcpy.AddMessage(f"Wrote {writer.rows} rows to {writer.path}")
+        return writer.close()
+
+    def _download_sync(self, arcsnow, sql_query, out_database, out_name, sync_column, key_fields=None, reset=False,
+                       threads=1, spatial_reference=None):
+        """Fetch only the rows past the table's watermark and add them to the
+        existing output, replacing rows with the same key; the first run, or
+        a reset, downloads everything."""
+        from gdb_writer import GDBWriter
+        from watermark import Watermarks, delta_sql, mark_column, max_value
+
+        table_name = arcpy.ValidateTableName(out_name, out_database)
+        marks = Watermarks(out_database)
+        mark = None if reset or not arcpy.Exists(os.path.join(out_database, table_name)) else marks.get(table_name)
+        if mark and mark[0].upper() != sync_column.strip('"').upper():
+            arcpy.AddWarning(f"{table_name} was synced on {mark[0]}, downloading it again in full")
+            mark = None
+
+        if not arcsnow.conn:
+            arcsnow.login()
+        cursor = arcsnow.cursor
+        arcsnow.alter_session(GEOGRAPHY_OUTPUT_FORMAT='WKB', GEOMETRY_OUTPUT_FORMAT='WKB')
+
+        index, column, type_name = mark_column(cursor.describe(sql_query), sync_column)
+        if mark:
+            arcpy.AddMessage(f"Fetching rows with {column} > {mark[1]}")
+            sql_query = delta_sql(sql_query, column, mark[2], mark[1])
+        else:
+            arcpy.AddMessage(f"Downloading {table_name} in full")
+
+        with instrumentation.stage("query"):
+            cursor.execute(sql_query)
+        instrumentation.query("query", cursor)
+
+        writer = GDBWriter(out_database, out_name, cursor.description, spatial_reference,
+                           append=bool(mark), key_columns=key_fields if mark else None)
+
+        newest = None
+        for table in instrumentation.iterate("fetch", self._fetch_batches(cursor, threads), _arrow_size):
+            writer.write(table)
+            if table.num_rows:
+                value = max_value(table, index)
+                if value is not None and (newest is None or value > newest):
+                    newest = value
+
+        path = writer.close()
+        # An empty delta keeps the old mark; an empty full download has none.
+        if newest is not None:
+            marks.set(table_name, column, newest, type_name)
+        elif not mark:
+            marks.clear(table_name)
+
+        arcpy.AddMessage(f"Wrote {writer.rows} rows to {path}, replacing {writer.replaced}")
+        return path
+
+    def _download(self, arcsnow, sql_query, out_database, out_name, stream=True, threads=1, use_cache=True, refresh_cache=False,
+                  spatial_reference=None, extent=None, tile_size=DEFAULT_TILE_DEGREES, column_name=None, sync=None):
+        if sync:
+            return self._download_sync(arcsnow, sql_query, out_database, out_name, *sync, threads, spatial_reference)
+
+        if extent:
+            # Tiles always go through the cache, so panning only fetches the new ones.
+            if not arcsnow.conn:
+                arcsnow.login()
+            return self._download_tiles(arcsnow, sql_query, out_database, out_name, extent, tile_size,
+                                        column_name, threads, refresh_cache or not use_cache, spatial_reference)
+
+        cache = None
+        key = None
+        if stream and use_cache:
+            from result_cache import ResultCache
+
+            cache = ResultCache()
+            key = cache.key(sql_query, arcsnow.credentials)
+            entry = None if refresh_cache else cache.get(key)
+
+            # A cache hit never contacts Snowflake.
+            if entry:
+                return self._download_cached(entry, out_database, out_name, spatial_reference)
+
+        if not arcsnow.conn:
+            arcsnow.login()
+
+        if stream:
+            return self._download_stream(arcsnow, sql_query, out_database, out_name, threads, cache, key, spatial_reference)
+        return self._download_csv(arcsnow, sql_query, out_database, out_name)
+
+    def _lod_variants(self, arcsnow, sql_query, out_name, scales, tolerance):
+        """[(output name, query)] for each level of detail asked for."""
+        if not scales and not tolerance:
+            return [(out_name, sql_query)]
+
+        from lod import lod_name, scale_tolerance, simplify_sql
+
+        if not arcsnow.conn:
+            arcsnow.login()
+        description = arcsnow.cursor.describe(sql_query)
+
+        if tolerance:
+            arcpy.AddMessage(f"Simplifying geographies to {tolerance} m")
+            return [(out_name, simplify_sql(sql_query, description, tolerance))]
+
+        variants = []
+        for scale in sorted(scales):
+            arcpy.AddMessage(f"1:{scale:,.0f} -> {scale_tolerance(scale):.1f} m tolerance")
+            name = out_name if len(scales) == 1 else lod_name(out_name, scale)
+            variants.append((name, simplify_sql(sql_query, description, scale_tolerance(scale))))
+
+        return variants
+
+    @instrumentation.traced
+    def execute(self, parameters, messages):
+        sql_query = parameters[1].valueAsText
+        out_database = parameters[2].valueAsText
+        out_name = parameters[3].valueAsText
+        stream = parameters[5].value is not False
+        threads = parameters[6].value or 1
+        use_cache = parameters[7].value is not False
+        refresh_cache = bool(parameters[8].value)
+        spatial_reference = parameters[9].value
+        extent = parameters[10].value
+        tile_size = parameters[11].value or DEFAULT_TILE_DEGREES
+
+        sync = None
+        if parameters[16].valueAsText:
+            # Change tracking (CHANGES) only works on tables, not on the
+            # result of an arbitrary query, so the sync follows a column.
+            sync = (parameters[16].valueAsText, parameters[17].values, bool(parameters[18].value))
+            if extent:
+                arcpy.AddWarning("Syncing downloads the whole query; the extent is ignored")
+                extent = None
+        
+        arcsnow = asn.ArcSnow(parameters[0].valueAsText)
+        arcpy.AddMessage(sql_query)
+
+        outputs = []
+        for name, sql in self._lod_variants(arcsnow, sql_query, out_name, parameters[13].values, parameters[14].value):
+            outputs.append(self._download(arcsnow, sql, out_database, name, stream, threads, use_cache, refresh_cache,
+                                          spatial_reference, extent, tile_size, parameters[12].valueAsText, sync))
+
+        parameters[4].value = outputs[0]
+        parameters[15].values = outputs
+
+        arcsnow.logout()
         
 
+class batch_download(object):
+    def __init__(self):
+        """Define the tool (tool name is the name of the class)."""
+        self.label = "Batch Download Queries"
+        self.description = "Run several Snowflake queries at once and convert each result to a GDB table"
+        self.canRunInBackground = False
+        self.category = "ETL"
+
+        # Seconds between status checks of the running queries
+        self.poll_interval = 1.0
+
+    def getParameterInfo(self):
+        """Define parameter definitions"""
+        credentials = arcpy.Parameter(
+            displayName="Credentials File",
+            name="credentials",
+            datatype="DEFile",
+            parameterType="Required",
+            direction="Input")
+
+        queries = arcpy.Parameter(
+            displayName="Queries",
+            name="queries",
+            datatype="GPValueTable",
+            parameterType="Required",
+            direction="Input")
+
+        queries.columns = [["GPString", "SQL Query"], ["GPString", "Output Name"]]
+
+        out_database = arcpy.Parameter(
+            displayName="Target Database",
+            name="out_database",
+            datatype="DEWorkspace",
+            parameterType="Required",
+            direction="Input")
+
+        out_database.value = arcpy.env.workspace
+
+        max_running = arcpy.Parameter(
+            displayName="Queries Running At Once",
+            name="max_running",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        max_running.value = 8
+
+        fetch_threads = arcpy.Parameter(
+            displayName="Fetch Threads",
+            name="fetch_threads",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        fetch_threads.value = 4
+
+        out_tables = arcpy.Parameter(
+            displayName="Output Tables",
+            name="out_tables",
+            datatype="DETable",
+            parameterType="Derived",
+            direction="Output",
+            multiValue=True)
+
+        return [credentials, queries, out_database, max_running, fetch_threads, out_tables]
+
+    def updateParameters(self, parameters):
+        return
+
+    def _write(self, conn, query_id, out_database, out_name, threads):
+        from gdb_writer import GDBWriter
+
+        cursor = conn.cursor()
+        cursor.get_results_from_sfqid(query_id)
+
+        writer = GDBWriter(out_database, out_name, cursor.description)
+        with instrumentation.stage("batch.write"):
+            for table in instrumentation.iterate("fetch", download_query()._fetch_batches(cursor, threads), _arrow_size):
+                writer.write(table)
+
+        arcpy.AddMessage(f"  {out_name}: {writer.rows} rows")
+        return writer.close()
+
+    def _failed(self, failed, out_name, e):
+        arcpy.AddWarning(f"{out_name} failed: {getattr(e, 'msg', None) or e}")
+        failed.append(out_name)
+
+    def _run(self, conn, queries, out_database, max_running, threads):
+        """Keep up to max_running queries executing in the warehouse and
+        download each result as soon as its query finishes.
+
+        Results are written on one background thread, as arcpy is not
+        thread-safe, so finished queries keep being collected and new ones
+        started meanwhile. A query that fails to run or to download is
+        reported and skipped."""
+        outputs = {}
+        failed = []
+        pending = deque(queries)
+        running = {}
+        writing = {}
+
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            while pending or running or writing:
+                while pending and len(running) < max_running:
+                    sql_query, out_name = pending.popleft()
+                    try:
+                        cursor = conn.cursor()
+                        cursor.execute_async(sql_query)
+                    except Exception as e:
+                        self._failed(failed, out_name, e)
+                        continue
+                    instrumentation.query("batch.query", cursor)
+                    running[cursor.sfqid] = (out_name, time.time())
+
+                time.sleep(self.poll_interval)
+
+                for query_id in list(running):
+                    out_name, started = running[query_id]
+                    try:
+                        status = conn.get_query_status_throw_if_error(query_id)
+                        if conn.is_still_running(status):
+                            continue
+                    except Exception as e:
+                        del running[query_id]
+                        self._failed(failed, out_name, e)
+                        continue
+
+                    del running[query_id]
+                    arcpy.AddMessage(f"{out_name} finished in {time.time() - started:.1f}s")
+                    writing[writer.submit(self._write, conn, query_id, out_database, out_name, threads)] = out_name
+
+                for future in [x for x in writing if x.done()]:
+                    out_name = writing.pop(future)
+                    try:
+                        outputs[out_name] = future.result()
+                    except Exception as e:
+                        self._failed(failed, out_name, e)
+
+        return outputs, failed
+
+    @instrumentation.traced
+    def execute(self, parameters, messages):
+        queries = [(x[0], x[1]) for x in parameters[1].values]
+        out_database = parameters[2].valueAsText
+        max_running = parameters[3].value or 8
+        threads = parameters[4].value or 1
+
+        arcsnow = asn.ArcSnow(parameters[0].valueAsText)
+        arcsnow.login()
+
+        # Async queries run in this session, so they return spatial columns as WKB too.
+        arcsnow.alter_session(GEOGRAPHY_OUTPUT_FORMAT='WKB', GEOMETRY_OUTPUT_FORMAT='WKB')
+
+        arcpy.AddMessage(f"Running {len(queries)} queries, {max_running} at a time")
+        outputs, failed = self._run(arcsnow.conn, queries, out_database, max_running, threads)
+
+        arcpy.AddMessage(f"{len(outputs)} downloaded, {len(failed)} failed")
+        if failed:
+            arcpy.AddWarning(f"Failed outputs: {', '.join(failed)}")
+
+        # Keep the order the queries were listed in.
+        parameters[5].values = [outputs[x[1]] for x in queries if x[1] in outputs]
+        arcsnow.logout()
+
+
 class create_table(object):
     def __init__(self):
         self.label = "Create Table"
         self.description = "Create a Snowflake table from a DETable"
         self.canRunInBackground = False
         self.category = "Snowflake"
-        self._field_lookup = {
-            "Double":"DOUBLE",
-            "Single":"DOUBLE",
-            "SmallInteger":"INT",
-            "Integer":"INT",
-            "String":"VARCHAR",
-            "Date":"DATETIME",
-            "Geometry":"GEOGRAPHY"
-        }
+        self._field_lookup = FIELD_TYPES
         
     def getParameterInfo(self):
         credentials = arcpy.Parameter(
@@ -143,8 +830,28 @@ class create_table(object):
             datatype="GPString",
             parameterType="Derived",
             direction="Output")
+
+        # 4
+        incremental = arcpy.Parameter(
+            displayName="Keep Existing Table For Incremental Loads",
+            name="incremental",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        incremental.value = False
+
+        # 5
+        cell_key = arcpy.Parameter(
+            displayName="Add Spatial Cell Key Column",
+            name="cell_key",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        cell_key.value = False
             
-        return [credentials, in_table, out_name, out_table]
+        return [credentials, in_table, out_name, out_table, incremental, cell_key]
         
     def _fix_field_name(self, s):
         s = s.strip()
@@ -168,28 +875,55 @@ class create_table(object):
         
     def updateParameters(self, parameters):
         return
+
+    def _create(self, cursor, in_table, table_name, incremental=False, cell_key=False):
+        create_table = self._create_sql(in_table, table_name, incremental, cell_key)
+        arcpy.AddMessage(create_table)
+        self._run_create(cursor, table_name, create_table, incremental)
+
+    def _create_sql(self, in_table, table_name, incremental=False, cell_key=False):
+        fields = [x for x in arcpy.ListFields(in_table) if x.type in self._field_lookup.keys()]
+        
+        sql_fields = ",".join([field_column(x) for x in fields])
+
+        # The cell key column, filled by insert_into, clusters the table by area.
+        cluster_by = ""
+        if cell_key and any(x.type == "Geometry" for x in fields):
+            sql_fields += f",{column_sql()}"
+            cluster_by = f" CLUSTER BY ({CELL_COLUMN})"
+        
+        if incremental:
+            # An existing table is kept and gets the row hash column used by
+            # the Upsert load mode of csv_upload and insert_into.
+            create_table = f"CREATE TABLE IF NOT EXISTS {table_name} ({sql_fields},{HASH_COLUMN} VARCHAR(32)){cluster_by};"
+        else:
+            create_table = f"CREATE TABLE {table_name} ({sql_fields}){cluster_by};"
+        return create_table
+
+    def _run_create(self, cursor, table_name, create_table, incremental=False):
+        # Only SQL from here on, so tools may run it off the main thread.
+        if not incremental:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
+
+        with instrumentation.stage("create"):
+            cursor.execute(create_table)
+        instrumentation.query("create", cursor)
+        cursor.execute(f'GRANT ALL ON {table_name} TO ROLE ACCOUNTADMIN;')
+        cursor.execute(f'GRANT SELECT ON {table_name} TO ROLE PUBLIC;')
             
+    @instrumentation.traced
     def execute(self, parameters, messages):
         arcsnow = asn.ArcSnow(parameters[0].valueAsText)
         arcsnow.login()
         
         in_table = parameters[1].value
         table_name = parameters[2].valueAsText
+        incremental = bool(parameters[4].value)
         
-        arcsnow.cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
-        
-        fields = [x for x in arcpy.ListFields(in_table) if x.type in self._field_lookup.keys()]
-        
-        sql_fields = ",".join([f"{x.name} {self._field_lookup[x.type]}" for x in fields])
-        
-        create_table = f"CREATE TABLE {table_name} ({sql_fields});"
-        arcpy.AddMessage(create_table)
-
-        arcsnow.cursor.execute(create_table)
-        arcsnow.cursor.execute(f'GRANT ALL ON {table_name} TO ROLE ACCOUNTADMIN;')
-        arcsnow.cursor.execute(f'GRANT SELECT ON {table_name} TO ROLE PUBLIC;')
+        self._create(arcsnow.cursor, in_table, table_name, incremental, bool(parameters[5].value))
         
         parameters[3].value = parameters[2].valueAsText
+        arcsnow.logout()
         
         return
     
@@ -202,24 +936,20 @@ class csv_upload(object):
         self.canRunInBackground = False
         self.category = "ETL"
 
-    df = pd.DataFrame()
+    df = None
     long_table_name = ""
     field_definitions = []
+    # Rows read from the CSV to suggest field definitions
+    sample_rows = 10000
+    # Bytes of CSV text parsed per block, blocks parsed at once, and chunks
+    # allowed in flight
+    chunk_bytes = 8 * 1024 ** 2
+    parse_threads = min(os.cpu_count() or 1, 8)
+    upload_threads = 2
+    # Starting size and bounds, in Arrow bytes, of the chunks staged as Parquet
+    stage_chunk = dict(size=16 * MB, min_size=MB, max_size=256 * MB)
 
 
-    def _dtype_to_ftype(self, s):
-        lookup = {
-            "float":"DOUBLE",
-            "float64":"DOUBLE",
-            "int":"INT",
-            "int64":"INT",
-            "string":"VARCHAR",
-            "object":"VARCHAR",
-            "datetime":"DATETIME"            
-        }
-
-        return str(lookup[str(s)])
-
     def _fix_field_name(self, s):
         s = s.strip()
         
@@ -240,6 +970,189 @@ class csv_upload(object):
             
         return s
 
+    def _blocks(self, csv_path):
+        """Split the CSV into blocks of about chunk_bytes that end on a line
+        break. Like Arrow's own block splitting by default, this assumes
+        quoted values hold no line breaks."""
+        with open(csv_path, "rb") as f:
+            while True:
+                block = f.read(csv_upload.chunk_bytes)
+                if not block:
+                    return
+                yield block + f.readline()
+
+    def _read_chunks(self, csv_path, field_definitions):
+        """Yield the CSV as Arrow tables of about chunk_bytes each, with the
+        columns renamed and coerced to the field definitions.
+
+        Arrow's streaming reader parses on one thread, so blocks are parsed
+        on a pool of parse_threads instead, at most two per thread ahead,
+        and yielded in file order."""
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        field_names = [f[0] for f in field_definitions]
+        column_types = {}
+        for field in field_definitions:
+            column_type = arrow_type(field)
+            if column_type is not None:
+                column_types[field[0]] = column_type
+        dates = [i for i, f in enumerate(field_definitions) if f[1].upper() == "DATE"]
+
+        # Only the first block starts with the header line.
+        read_options = [pacsv.ReadOptions(column_names=field_names, skip_rows=skip, use_threads=False) for skip in (0, 1)]
+        convert_options = pacsv.ConvertOptions(
+            column_types=column_types,
+            strings_can_be_null=True,
+            true_values=TRUE_VALUES,
+            false_values=FALSE_VALUES,
+            timestamp_parsers=[pacsv.ISO8601] + TIMESTAMP_FORMATS)
+
+        def parse(block, first):
+            table = pacsv.read_csv(pa.BufferReader(block), read_options=read_options[first], convert_options=convert_options)
+            for i in dates:
+                table = table.set_column(i, field_names[i], table.column(i).cast(pa.date32(), safe=False))
+            return table
+
+        def parsed():
+            threads = csv_upload.parse_threads
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                pending = deque()
+                for i, block in enumerate(self._blocks(csv_path)):
+                    pending.append(pool.submit(parse, block, int(i == 0)))
+                    if len(pending) >= threads * 2:
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+
+        yield from instrumentation.iterate("csv.read", parsed(), _arrow_size)
+
+    def _sized_chunks(self, tables, chunker):
+        """Regroup the parsed blocks into chunks of about chunker.size bytes;
+        the size is read again for every chunk as it adapts."""
+        import pyarrow as pa
+
+        pending = []
+        pending_bytes = 0
+        for table in tables:
+            pending.append(table)
+            pending_bytes += table.nbytes
+
+            while pending_bytes >= chunker.size:
+                combined = pa.concat_tables(pending)
+                average = combined.nbytes / max(combined.num_rows, 1)
+                rows = chunker.rows(average)
+                yield combined.slice(0, rows)
+
+                rest = combined.slice(rows)
+                pending = [rest] if rest.num_rows else []
+                pending_bytes = int(rest.num_rows * average)
+
+        if pending:
+            yield pa.concat_tables(pending)
+
+    def _skip_rows(self, tables, rows):
+        """Drop the first rows of the CSV, already uploaded by an earlier run."""
+        for table in tables:
+            if rows >= table.num_rows:
+                rows -= table.num_rows
+                continue
+            yield table.slice(rows) if rows else table
+            rows = 0
+
+    def _put_chunk(self, loader, manifest, table, index, start):
+        file_name = loader.put(table, index)
+        if manifest:
+            manifest.add_chunk(index, start, table.num_rows, file_name)
+
+    def _with_cells(self, tables, cell_key, lat_name, lon_name):
+        """Add the cell key column to every chunk and sort the chunk by it, so
+        each staged file covers a compact area."""
+        import pyarrow as pa
+
+        for table in tables:
+            lats = table.column(lat_name).cast(pa.float64()).to_pylist()
+            lons = table.column(lon_name).cast(pa.float64()).to_pylist()
+            table = table.append_column(CELL_COLUMN, pa.array(cell_key.cells(lats, lons), pa.string()))
+            yield table.sort_by(CELL_COLUMN)
+
+    def _stage_load(self, snow_cur, csv_path, compression=AUTO, chunk_mb=None, cell_key=None, lat_lon=None, manifest=None):
+        # Stage the data as compressed Parquet chunks and load them with one
+        # COPY INTO; the columns are matched by name against the new table.
+        # With a manifest every staged chunk is recorded, and a rerun skips
+        # the rows of the chunks an earlier run already staged.
+        from staging import StageLoader
+
+        if chunk_mb:
+            chunker = AdaptiveChunker(size=int(chunk_mb * MB), adaptive=False)
+        else:
+            chunker = AdaptiveChunker(**csv_upload.stage_chunk)
+        codecs = CodecChooser(compression)
+
+        loader = StageLoader(snow_cur, csv_upload.long_table_name, chunker=chunker, codecs=codecs,
+                             prefix=manifest.run_id if manifest else None)
+        try:
+            index, offset = 0, 0
+            if manifest and manifest.resumed:
+                index, offset, staged, stale = manifest.completed_chunks()
+                loader.remove(stale)
+                loader.resume(staged)
+                arcpy.AddMessage(f"Resuming after {index} chunks ({offset} rows) uploaded by an earlier run")
+
+            with ThreadPoolExecutor(max_workers=csv_upload.upload_threads) as pool:
+                pending = deque()
+                tables = self._read_chunks(csv_path, csv_upload.field_definitions)
+                if offset:
+                    tables = self._skip_rows(tables, offset)
+                tables = self._sized_chunks(tables, chunker)
+                if cell_key:
+                    tables = self._with_cells(tables, cell_key, *lat_lon)
+                for table in tables:
+                    pending.append(pool.submit(self._put_chunk, loader, manifest, table, index, offset))
+                    index += 1
+                    offset += table.num_rows
+                    # Keep parsing ahead of the uploads, but only so far.
+                    while len(pending) > csv_upload.upload_threads:
+                        pending.popleft().result()
+
+                while pending:
+                    pending.popleft().result()
+
+            arcpy.AddMessage(f"Upload settings: {chunker.summary()}, {codecs.codec} compression "
+                             f"(pin with Chunk Size {chunker.size / MB:.2f} MB and Compression {codecs.codec})")
+            return loader.copy(manifest.mark_loaded if manifest else None)
+        finally:
+            loader.close()
+
+    def _table_exists(self, snow_cur):
+        from snowflake.connector.errors import ProgrammingError
+
+        try:
+            snow_cur.execute(f"DESCRIBE TABLE {csv_upload.long_table_name};")
+        except ProgrammingError:
+            return False
+        return True
+
+    def _upsert(self, snow_cur, csv_path, key_fields, detect_deletes):
+        columns = [f'"{f[0]}"' for f in csv_upload.field_definitions]
+        sync = IncrementalSync(snow_cur, csv_upload.long_table_name, columns, key_fields, detect_deletes)
+        sync.prepare()
+
+        # The file is parsed twice: once for the hashes, then for the rows
+        # Snowflake reports as new or changed.
+        rows = 0
+        for table in self._read_chunks(csv_path, csv_upload.field_definitions):
+            sync.hash(zip(*[x.to_pylist() for x in table.columns]))
+            rows += table.num_rows
+
+        sync.compare()
+        for table in self._read_chunks(csv_path, csv_upload.field_definitions):
+            sync.add(zip(*[x.to_pylist() for x in table.columns]))
+
+        sync.finish()
+        return rows
+
     def getParameterInfo(self):
         """Define parameter definitions"""
         credentials = arcpy.Parameter(
@@ -311,14 +1224,123 @@ class csv_upload(object):
             ['GPString', 'Name'],
             ['GPString', 'Type'],
             ['GPLong', 'Length'],
-            ['GPBoolean', 'Nullable']
+            ['GPBoolean', 'Nullable'],
+            ['GPLong', 'Scale']
         ]
         
         # Field Defs Parameter Columns Filters
         csv_field_defs.filters[1].type = 'ValueList'
-        csv_field_defs.filters[1].list = ['VARCHAR', 'DOUBLE', 'INT', 'DATETIME']
+        csv_field_defs.filters[1].list = DEFINITION_TYPES
+
+        # 7
+        load_mode = arcpy.Parameter(
+            displayName="Load Mode",
+            name="load_mode",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        load_mode.filter.type = 'ValueList'
+        load_mode.filter.list = ['Replace', 'Append', 'Upsert']
+        load_mode.value = 'Replace'
+
+        # 8
+        key_fields = arcpy.Parameter(
+            displayName="Upsert Key Fields",
+            name="key_fields",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
+        # 9
+        detect_deletes = arcpy.Parameter(
+            displayName="Delete Rows Missing From CSV",
+            name="detect_deletes",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        detect_deletes.value = False
+
+        # 10
+        compression = arcpy.Parameter(
+            displayName="Compression",
+            name="compression",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        compression.filter.type = 'ValueList'
+        compression.filter.list = [AUTO] + list(CODECS)
+        compression.value = AUTO
 
-        params = [credentials, input_csv, db_name, schema_name, table_name, csv_field_defs, out_table_name]
+        # 11 - empty to tune the chunk size while loading
+        chunk_mb = arcpy.Parameter(
+            displayName="Chunk Size (MB)",
+            name="chunk_mb",
+            datatype="GPDouble",
+            parameterType="Optional",
+            direction="Input")
+
+        # 12
+        cell_scheme = arcpy.Parameter(
+            displayName="Spatial Cell Key",
+            name="cell_scheme",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        cell_scheme.filter.type = 'ValueList'
+        cell_scheme.filter.list = SCHEMES
+        cell_scheme.value = 'NONE'
+
+        # 13 - empty for the scheme's default
+        cell_resolution = arcpy.Parameter(
+            displayName="Cell Key Resolution",
+            name="cell_resolution",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        # 14
+        lat_field = arcpy.Parameter(
+            displayName="Latitude Field",
+            name="lat_field",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        # 15
+        lon_field = arcpy.Parameter(
+            displayName="Longitude Field",
+            name="lon_field",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        # 16
+        recluster = arcpy.Parameter(
+            displayName="Rewrite Table In Cell Order After Loading",
+            name="recluster",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        recluster.value = False
+
+        # 17 - an interrupted Replace or Append upload otherwise resumes
+        restart = arcpy.Parameter(
+            displayName="Discard Interrupted Upload",
+            name="restart",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        restart.value = False
+
+        params = [credentials, input_csv, db_name, schema_name, table_name, csv_field_defs, out_table_name, load_mode, key_fields, detect_deletes,
+                  compression, chunk_mb, cell_scheme, cell_resolution, lat_field, lon_field, recluster, restart]
         return params
 
     def isLicensed(self):
@@ -345,8 +1367,13 @@ class csv_upload(object):
             # Use the CSV name as the Table name
             parameters[4].value = os.path.splitext(os.path.basename(parameters[1].valueAsText))[0]
             
-            csv_upload.df = pd.read_csv(parameters[1].valueAsText)
+            # Only a sample is read here; execute streams the whole file.
+            import pandas as pd
+
+            csv_upload.df = pd.read_csv(parameters[1].valueAsText, nrows=csv_upload.sample_rows)
             csv_upload.field_definitions = []
+            # Only a sample that is the whole file can prove a column has no nulls.
+            complete = len(csv_upload.df) < csv_upload.sample_rows
 
             renamed = []
             fields = []
@@ -361,14 +1388,10 @@ class csv_upload(object):
                 print (f"dc info = {csv_upload.df.dtypes[dc]}")
                 a_field_name = self._fix_field_name(dc)
                 renamed.append(a_field_name)
-                a_field_type = self._dtype_to_ftype(csv_upload.df.dtypes[dc]) # field type
-                if a_field_type == "VARCHAR": 
-                    a_field_len = 255
-                else:
-                    a_field_len = None
-                a_field_nullable = 'true'
-
-                a_field = [a_field_name, a_field_type, a_field_len, a_field_nullable]
+                # Type, length (precision of NUMBER), nullability and scale from the sampled values
+                a_field_type, a_field_len, a_field_scale, a_field_nullable = infer_column(csv_upload.df[dc], complete)
+
+                a_field = [a_field_name, a_field_type, a_field_len, a_field_nullable, a_field_scale]
                 csv_upload.field_definitions.append(a_field)
 
 
@@ -380,6 +1403,11 @@ class csv_upload(object):
 
             csv_upload.df.columns = renamed
 
+            # Suggest coordinate columns for the cell key by their names.
+            lat_name, lon_name = guess_lat_lon(renamed)
+            parameters[14].value = lat_name
+            parameters[15].value = lon_name
+
         parameters[5].values = csv_upload.field_definitions
 
         # SAMPLE
@@ -400,6 +1428,7 @@ class csv_upload(object):
 
         return
 
+    @instrumentation.traced
     def execute(self, parameters, messages):
         """Executes when Run button is pressed."""
 
@@ -415,97 +1444,69 @@ class csv_upload(object):
         schema_name = parameters[3].valueAsText
         table_name = parameters[4].valueAsText
         csv_upload.field_definitions = parameters[5].value
-        field_names = [f[0] for f in csv_upload.field_definitions]
         
         arcpy.AddMessage(f"field_definitions: {parameters[5].value}")
 
+        load_mode = parameters[7].valueAsText or 'Replace'
+
+        cell_key = None
+        lat_lon = None
+        scheme = parameters[12].valueAsText or 'NONE'
+        if scheme != 'NONE':
+            guessed = guess_lat_lon([x[0] for x in csv_upload.field_definitions])
+            lat_lon = (parameters[14].valueAsText or guessed[0], parameters[15].valueAsText or guessed[1])
+            if load_mode == 'Upsert':
+                arcpy.AddWarning("The Upsert load mode does not add a spatial cell key")
+            elif None in lat_lon:
+                arcpy.AddWarning("No latitude and longitude fields, so no spatial cell key is added")
+            else:
+                cell_key = CellKey(scheme, parameters[13].value)
+                arcpy.AddMessage(f"Clustering on {CELL_COLUMN} ({cell_key}) from {lat_lon[0]}, {lat_lon[1]}")
+
+        # A rerun with the same CSV and settings continues an interrupted
+        # upload, as long as the table and its stage are still there.
+        manifest = None
+        if load_mode != 'Upsert':
+            settings = [load_mode, csv_upload.field_definitions, str(cell_key) if cell_key else None, lat_lon]
+            manifest = Manifest("csv_upload", fingerprint(parameters[1].valueAsText), csv_upload.long_table_name, settings)
+            if manifest.resumed and (parameters[17].value or not self._table_exists(snow_cur)):
+                manifest.finish()
+
         # Create a Schema and/or Drop the Table if it exists
         snow_cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema_name};")
         snow_cur.execute(f"USE SCHEMA {schema_name};")
-        snow_cur.execute(f"DROP TABLE IF EXISTS {table_name};")
+        if load_mode == 'Replace' and not (manifest and manifest.resumed):
+            snow_cur.execute(f"DROP TABLE IF EXISTS {table_name};")
 
         # Create the Table SQL Statement
         create_table_sql = f'CREATE TABLE IF NOT EXISTS {csv_upload.long_table_name} ('
 
-        fields = []
-        for i, field in enumerate(csv_upload.field_definitions):
-            field_name = field[0]
-            field_type = field[1]
-            if "VARCHAR" in field_type:
-                field_type += f'({field[2]})'
-
-
-            create_table_sql += f'"{field_name}" {field_type} NOT NULL '
-            if i < len(csv_upload.field_definitions)-1:
-                create_table_sql += f', '
-
-            fields.append(f'{field_name} {field_type} {field[3]}')
-            
-        fields = ",".join(fields)
-        # arcpy.AddMessage(f"Execute Fields: {fields}")
-
+        create_table_sql += ", ".join(definition_column(x) for x in csv_upload.field_definitions)
         create_table_sql += f');'
         arcpy.AddMessage(f"Create Table SQL: {create_table_sql}")
 
         snow_cur.execute(create_table_sql)
+        if cell_key:
+            for sql in prepare_sql(csv_upload.long_table_name):
+                snow_cur.execute(sql)
         snow_cur.execute(f'GRANT ALL ON {csv_upload.long_table_name} TO ROLE ACCOUNTADMIN;')
         snow_cur.execute(f'GRANT SELECT ON {csv_upload.long_table_name} TO ROLE PUBLIC;')
         
 
-        # TODO CONVERT THE FOLLOWING TO LINE BY LINE ASAP!!!!
-        # This creates one long SQL statement
-        # Because the data is in the SQL it can be both read 
-        # and creates a string that is extremely long.
-
-
-        # SAMPLE
-        # INSERT INTO "ARCSNOW_DB"."ARCSNOW_TESTING_SCHEMA"."CSV_UPLOAD_TESTS_2_COL" 
-        # ("INDEX","FIRST_COL") 
-        # VALUES (1,'First Col1'),(2,'First Col2'),(3,'First Col3'),(4,'First Col4'),
-        # (5,'First Col5'),(6,'First Col6'),(7,'First Col7'),(8,'First Col8'),(9,'First Col9');
+        if load_mode == 'Upsert':
+            key_fields = [f'"{x}"' for x in (parameters[8].values or [])]
+            rows = self._upsert(snow_cur, parameters[1].valueAsText, key_fields, bool(parameters[9].value))
+        else:
+            rows = self._stage_load(snow_cur, parameters[1].valueAsText, parameters[10].valueAsText or AUTO, parameters[11].value,
+                                    cell_key, lat_lon, manifest)
+            manifest.finish()
 
-        csv_upload.sql_fields_list = ','.join(f'"{x}"' for x in field_names)
-
-        # Create INSERT ROWS SQL
-        insert_values_sql = f'INSERT INTO {csv_upload.long_table_name} ({csv_upload.sql_fields_list}) VALUES '
-        
-        # arcpy.AddMessage(f"SQL for INSERT: {insert_values_sql}")
-        rows = []
-        for i in range(len(csv_upload.df)):
-            row = csv_upload.df.iloc[i]
-
-            # arcpy.AddMessage(f'Execute: Row {i} Data : {row}')
-
-            # Start data_string
-            data_string = f"("
-            for c_index, c_name in enumerate(csv_upload.df):
-                value = row[c_name]
-                # arcpy.AddMessage(f'Execute: field_definitions[c_index][1] : {csv_upload.field_definitions[c_index][1]}')
-                if 'VARCHAR' in csv_upload.field_definitions[c_index][1]:
-                    data_string += f"'{value}'"
-                else:
-                    data_string += f"{value}"
-
-                if c_index < len(row)-1:
-                    data_string += f', '
-                else:
-                    data_string += f")"
-
-            if i < len(csv_upload.df)-1:
-                data_string += f', '
-            # End data_string
-
-            rows.append(data_string)
-
-        values = ''.join(f'{x}' for x in rows)
-        insert_values_sql += values
-        # End SQL for INSERT
-        insert_values_sql += f';'
-        
-        arcpy.AddMessage(f'INSERT SQL: {insert_values_sql}')
-        # arcpy.AddMessage(f'Execute: values : {values}')
+        if cell_key and parameters[16].value:
+            arcpy.AddMessage(f"Rewriting {csv_upload.long_table_name} in {CELL_COLUMN} order")
+            with instrumentation.stage("recluster"):
+                snow_cur.execute(recluster_sql(csv_upload.long_table_name))
 
-        snow_cur.execute(insert_values_sql)
+        arcpy.AddMessage(f"Loaded {rows} rows into {csv_upload.long_table_name}")
         arcsnow.logout()
                     
         return
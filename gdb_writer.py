@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+import arcpy
+import instrumentation
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from snowflake.connector.constants import FIELD_ID_TO_NAME
+
+
+# Longest text field created when Snowflake reports an unbounded VARCHAR.
+# Matches what TableToTable picks when it reads text columns from a CSV.
+TEXT_LENGTH = 8000
+
+SPATIAL_TYPES = ("GEOGRAPHY", "GEOMETRY")
+
+# Base WKB geometry codes to feature class geometry types.
+_WKB_TYPES = {
+    1: "POINT",
+    2: "POLYLINE",
+    3: "POLYGON",
+    4: "MULTIPOINT",
+    5: "POLYLINE",
+    6: "POLYGON"
+}
+
+
+def wkb_geometry_type(wkb):
+    """Return the feature class geometry type and Z flag of a WKB or EWKB value."""
+    byte_order = "<" if wkb[0] == 1 else ">"
+    code = struct.unpack(f"{byte_order}I", bytes(wkb[1:5]))[0]
+
+    # EWKB carries dimensions in the high bits, ISO WKB in the thousands.
+    iso = code & 0x0FFFFFFF
+    has_z = bool(code & 0x80000000) or iso // 1000 in (1, 3)
+
+    base = iso % 1000
+    if base == 7:
+        raise ValueError("The result has GEOMETRYCOLLECTION values, which a feature class cannot hold; "
+                         "filter or convert them in the query")
+    if base not in _WKB_TYPES:
+        raise ValueError(f"Unsupported WKB geometry type {base}")
+
+    return _WKB_TYPES[base], has_z
+
+
+def shape_type(values):
+    """Feature class geometry type and Z flag able to hold every one of
+    the WKB values. Lines and polygons are multipart already, so only
+    points are promoted, to MULTIPOINT, when multipoints are mixed in."""
+    types = set()
+    has_z = False
+    for wkb in values:
+        geometry_type, z = wkb_geometry_type(wkb)
+        types.add(geometry_type)
+        has_z = has_z or z
+
+    if types == {"POINT", "MULTIPOINT"}:
+        return "MULTIPOINT", has_z
+    if len(types) > 1:
+        raise ValueError(f"The result mixes {', '.join(sorted(types))} geometries, which no one feature class can hold")
+
+    return types.pop(), has_z
+
+
+def field_spec(column):
+    """(field type, length) of the geodatabase field a result column becomes."""
+    type_name = FIELD_ID_TO_NAME[column.type_code]
+
+    if type_name == "FIXED":
+        if not column.scale and column.precision and column.precision <= 9:
+            return "LONG", None
+        return "DOUBLE", None
+    if type_name == "REAL":
+        return "DOUBLE", None
+    if type_name in ("DATE", "TIMESTAMP_LTZ", "TIMESTAMP_NTZ", "TIMESTAMP_TZ"):
+        return "DATE", None
+    if type_name == "BOOLEAN":
+        return "SHORT", None
+    if type_name == "BINARY" or type_name in SPATIAL_TYPES:
+        return "BLOB", None
+
+    length = column.internal_size or TEXT_LENGTH
+    return "TEXT", min(length, TEXT_LENGTH)
+
+
+class GDBWriter(object):
+    """Append Arrow batches from a Snowflake cursor into a geodatabase table.
+
+    The output schema comes from the cursor description. When the result has
+    a GEOGRAPHY or GEOMETRY column, fetched as WKB, the first one becomes the
+    shape of a feature class whose geometry type is read from all values of
+    the first batch; any further spatial columns are kept as raw WKB blobs.
+
+    With `append` an existing table is written into instead of replaced, and
+    rows whose `key_columns` values are already in it replace those rows."""
+
+    def __init__(self, out_database, out_name, description, spatial_reference=None, append=False, key_columns=None):
+        self._out_database = out_database
+        self._out_name = arcpy.ValidateTableName(out_name, out_database)
+        self._description = description
+        self._spatial_reference = spatial_reference
+        self._append = append
+        self._key_columns = [x.strip('"').upper() for x in key_columns or []]
+        self._fields = []
+        self._created = False
+        self._rows = 0
+        self._replaced = 0
+        # Keys of the written rows and the ObjectIDs they were given, so the
+        # rows they replace can be deleted in one pass by close().
+        self._keys = set()
+        self._new_oids = set()
+
+        self._shape_index = None
+        for index, column in enumerate(description):
+            if FIELD_ID_TO_NAME[column.type_code] in SPATIAL_TYPES:
+                self._shape_index = index
+                break
+
+    def _field_name(self, name, taken):
+        field_name = arcpy.ValidateFieldName(name, self._out_database)
+
+        suffix = 1
+        unique = field_name
+        while unique.upper() in taken:
+            unique = f"{field_name}_{suffix}"
+            suffix += 1
+
+        taken.add(unique.upper())
+        return unique
+
+    def _shape_spec(self, table):
+        geometry_type, has_z = "POINT", False
+
+        if table is not None and table.num_rows:
+            shapes = table.column(self._shape_index).drop_null()
+            if len(shapes):
+                with instrumentation.stage("gdb.shape_type"):
+                    geometry_type, has_z = shape_type(shapes.to_pylist())
+            else:
+                arcpy.AddWarning("First batch has no geometry, defaulting to POINT")
+
+        # GEOGRAPHY is always WGS84 longitude/latitude in Snowflake.
+        column = self._description[self._shape_index]
+        if FIELD_ID_TO_NAME[column.type_code] == "GEOGRAPHY" or self._spatial_reference is None:
+            spatial_reference = arcpy.SpatialReference(4326)
+        else:
+            spatial_reference = self._spatial_reference
+
+        return geometry_type, has_z, spatial_reference
+
+    def _open(self):
+        """Map the result columns onto the fields of the existing table."""
+        existing = {x.name.upper(): x.name for x in arcpy.ListFields(self.path)}
+
+        for index, column in enumerate(self._description):
+            if index == self._shape_index:
+                self._fields.append(("SHAPE@WKB", "Geometry"))
+                continue
+
+            field_name = arcpy.ValidateFieldName(column.name, self._out_database)
+            if field_name.upper() not in existing:
+                raise ValueError(f"{self.path} has no field for column {column.name}; download it again in full")
+            self._fields.append((existing[field_name.upper()], field_spec(column)[0]))
+
+        self._created = True
+
+    def _key_indexes(self):
+        names = [x.name.upper() for x in self._description]
+        indexes = []
+        for key in self._key_columns:
+            if key not in names:
+                raise ValueError(f"The query returns no key column {key}")
+            indexes.append(names.index(key))
+        return indexes
+
+    def _delete_replaced(self):
+        """Delete the older rows with the key of a written row, in a single
+        pass over the table once all batches are in."""
+        indexes = self._key_indexes()
+        with instrumentation.stage("gdb.delete"), arcpy.da.UpdateCursor(self.path, ["OID@"] + [self._fields[x][0] for x in indexes]) as UC:
+            for row in UC:
+                if row[0] not in self._new_oids and tuple(row[1:]) in self._keys:
+                    UC.deleteRow()
+                    self._replaced += 1
+
+    def _create(self, table=None):
+        if self._append and arcpy.Exists(self.path):
+            self._open()
+            return
+
+        if arcpy.Exists(self.path):
+            if not arcpy.env.overwriteOutput:
+                raise ValueError(f"{self.path} already exists")
+            arcpy.management.Delete(self.path)
+
+        if self._shape_index is None:
+            arcpy.management.CreateTable(self._out_database, self._out_name)
+        else:
+            geometry_type, has_z, spatial_reference = self._shape_spec(table)
+            arcpy.management.CreateFeatureclass(
+                self._out_database,
+                self._out_name,
+                geometry_type,
+                has_z="ENABLED" if has_z else "DISABLED",
+                spatial_reference=spatial_reference)
+            arcpy.AddMessage(f"Creating {geometry_type} feature class ({spatial_reference.name})")
+
+        taken = set(x.name.upper() for x in arcpy.ListFields(self.path))
+        field_description = []
+        for index, column in enumerate(self._description):
+            if index == self._shape_index:
+                self._fields.append(("SHAPE@WKB", "Geometry"))
+                continue
+
+            field_type, field_length = field_spec(column)
+            field_name = self._field_name(column.name, taken)
+            self._fields.append((field_name, field_type))
+            field_description.append([field_name, field_type, column.name, field_length])
+
+        if field_description:
+            arcpy.management.AddFields(self.path, field_description)
+
+        self._created = True
+
+    def _column_values(self, column, field_type):
+        if field_type in ("Geometry", "BLOB"):
+            # WKB goes to the insert cursor untouched; arcpy decodes it natively.
+            return column.to_pylist()
+        if pa.types.is_decimal(column.type):
+            column = pc.cast(column, pa.float64())
+        elif pa.types.is_timestamp(column.type) and column.type.tz is not None:
+            column = pc.cast(column, pa.timestamp(column.type.unit))
+        elif pa.types.is_boolean(column.type):
+            column = pc.cast(column, pa.int16())
+        elif field_type == "TEXT" and not pa.types.is_string(column.type):
+            column = pc.cast(column, pa.string())
+
+        return column.to_pylist()
+
+    def write(self, table):
+        """Insert one Arrow table or record batch; only this batch is held in
+        Python objects at a time."""
+        if not table.num_rows:
+            return
+
+        if not self._created:
+            self._create(table)
+
+        with instrumentation.stage("gdb.convert"):
+            columns = [self._column_values(column, field[1]) for column, field in zip(table.columns, self._fields)]
+
+        replacing = self._key_columns and self._append
+        if replacing:
+            self._keys.update(zip(*[columns[x] for x in self._key_indexes()]))
+
+        with instrumentation.stage("gdb.insert") as timer, arcpy.da.InsertCursor(self.path, [x[0] for x in self._fields]) as IC:
+            for row in zip(*columns):
+                oid = IC.insertRow(row)
+                if replacing:
+                    self._new_oids.add(oid)
+            timer.add(table.num_rows, table.nbytes)
+
+        self._rows += table.num_rows
+
+    def close(self):
+        if not self._created:
+            self._create()
+        if self._keys:
+            self._delete_replaced()
+
+        return self.path
+
+    @property
+    def path(self):
+        return os.path.join(self._out_database, self._out_name)
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def replaced(self):
+        return self._replaced
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+import math
+import uuid
+import decimal
+import hashlib
+import datetime
+
+import arcpy
+import instrumentation
+
+
+HASH_COLUMN = "ARCSNOW_ROW_HASH"
+# Position of a row in the source, in the temporary table of hashes.
+ROW_COLUMN = "ARCSNOW_ROW"
+
+
+def _canonical(value):
+    # The same value must hash the same whether it was read by arcpy, parsed
+    # from a CSV or fetched from Snowflake: 1, 1.0 and Decimal('1.00') are
+    # one number, and aware timestamps are compared in UTC.
+    if value is None:
+        return b"\x00"
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, bool):
+        return str(value).encode()
+    if isinstance(value, (int, float, decimal.Decimal)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return str(value).encode()
+        number = decimal.Decimal(str(value) if isinstance(value, float) else value)
+        if number == number.to_integral_value():
+            return str(int(number)).encode()
+        return format(number.normalize(), "f").encode()
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat().encode()
+
+    return str(value).encode()
+
+
+def row_hash(row):
+    """Stable 128 bit digest of a row's values, geometry included."""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in row:
+        digest.update(_canonical(value))
+        digest.update(b"\x1f")
+
+    return digest.hexdigest()
+
+
+class IncrementalSync(object):
+    """Upsert rows into a table, sending only the ones whose hash changed.
+
+    Rows are given as tuples in the order of `columns`, which are SQL ready
+    identifiers of the target table. Each row's hash is kept in HASH_COLUMN
+    of the target. The source is read twice, in the same order:
+
+      1. hash() binds only the key, hash and position of every row into a
+         narrow temporary table;
+      2. compare() joins it with the target in Snowflake and streams back,
+         in order, the positions of the rows that are new or changed;
+      3. add() binds those rows alone, in full, into a second temporary
+         table, applied by finish() with one MERGE.
+
+    Unchanged rows never leave the client and nothing about the target is
+    held in memory. Keys that no longer appear in the source can optionally
+    be deleted."""
+
+    def __init__(self, cursor, table_name, columns, key_columns, detect_deletes=False, batch_size=10000):
+        if not key_columns:
+            raise ValueError("Incremental loads need at least one key field")
+
+        self._cursor = cursor
+        self._table_name = table_name
+        self._columns = list(columns)
+        self._key_columns = list(key_columns)
+        unknown = [x for x in self._key_columns if x not in self._columns]
+        if unknown:
+            raise ValueError(f"Key fields {', '.join(unknown)} are not among the loaded columns")
+        self._key_index = [self._columns.index(x) for x in self._key_columns]
+        self._detect_deletes = detect_deletes
+        self._batch_size = batch_size
+
+        name = uuid.uuid4().hex.upper()
+        self._hash_table = f"ARCSNOW_HASHES_{name}"
+        self._delta_table = f"ARCSNOW_DELTA_{name}"
+        self._rows = 0
+        self._position = 0
+        self._changed = None
+        self._next = None
+        self._pending = []
+        self.counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+
+    def prepare(self):
+        keys = ",".join(self._key_columns)
+        self._cursor.execute(f"ALTER TABLE {self._table_name} ADD COLUMN IF NOT EXISTS {HASH_COLUMN} VARCHAR(32);")
+        self._cursor.execute(f"CREATE OR REPLACE TEMPORARY TABLE {self._hash_table} AS "
+                             f"SELECT {keys}, {HASH_COLUMN}, CAST(0 AS NUMBER(19,0)) AS {ROW_COLUMN} FROM {self._table_name} WHERE FALSE;")
+        self._cursor.execute(f"CREATE OR REPLACE TEMPORARY TABLE {self._delta_table} LIKE {self._table_name};")
+
+    def _flush(self, table, columns):
+        if not self._pending:
+            return
+
+        binds = ",".join("?" for x in columns)
+        with instrumentation.stage("upsert.hashes" if table == self._hash_table else "upsert.delta") as timer:
+            self._cursor.executemany(f"INSERT INTO {table} ({','.join(columns)}) VALUES ({binds});", self._pending)
+            timer.add(len(self._pending))
+        self._pending = []
+
+    def hash(self, rows):
+        """First pass: bind the key and hash of every source row."""
+        columns = self._key_columns + [HASH_COLUMN, ROW_COLUMN]
+        for row in rows:
+            self._pending.append(tuple(row[i] for i in self._key_index) + (row_hash(row), self._rows))
+            self._rows += 1
+            if len(self._pending) >= self._batch_size:
+                self._flush(self._hash_table, columns)
+
+        self._flush(self._hash_table, columns)
+
+    def compare(self):
+        """Find the new and changed rows in Snowflake; their positions are
+        read back lazily, in source order, while add() walks the source."""
+        on = " AND ".join(f"t.{x} = h.{x}" for x in self._key_columns)
+        first = self._key_columns[0]
+
+        # A cursor of its own, so the inserts of add() leave the result open.
+        self._changed = self._cursor.connection.cursor()
+        with instrumentation.stage("upsert.compare"):
+            self._changed.execute(
+                f"SELECT h.{ROW_COLUMN}, t.{first} IS NULL FROM {self._hash_table} h LEFT JOIN {self._table_name} t ON {on} "
+                f"WHERE t.{HASH_COLUMN} IS DISTINCT FROM h.{HASH_COLUMN} ORDER BY h.{ROW_COLUMN};")
+        instrumentation.query("upsert.compare", self._changed)
+        self._advance()
+
+    def _advance(self):
+        row = self._changed.fetchone()
+        self._next = None
+        if row is not None:
+            self._next = row[0]
+            self.counts["inserted" if row[1] else "updated"] += 1
+
+    def add(self, rows):
+        """Second pass: bind the rows compare() found new or changed. The
+        rows must come in the same order as they were given to hash()."""
+        for row in rows:
+            if self._position == self._next:
+                self._pending.append(tuple(row) + (row_hash(row),))
+                self._advance()
+                if len(self._pending) >= self._batch_size:
+                    self._flush(self._delta_table, self._columns + [HASH_COLUMN])
+            self._position += 1
+
+    def _merge(self):
+        on = " AND ".join(f"t.{x} = s.{x}" for x in self._key_columns)
+        columns = self._columns + [HASH_COLUMN]
+        updates = ",".join(f"t.{x} = s.{x}" for x in columns)
+        inserts = ",".join(columns)
+        values = ",".join(f"s.{x}" for x in columns)
+
+        with instrumentation.stage("upsert.merge"):
+            results = self._cursor.execute(
+                f"MERGE INTO {self._table_name} t USING {self._delta_table} s ON {on} "
+                f"WHEN MATCHED THEN UPDATE SET {updates} "
+                f"WHEN NOT MATCHED THEN INSERT ({inserts}) VALUES ({values});")
+        instrumentation.query("upsert.merge", results)
+
+    def _delete_missing(self):
+        # Every source key is in the hash table, so the missing ones are an
+        # anti join between it and the target.
+        keys = ",".join(f"x.{x}" for x in self._key_columns)
+        missing = " AND ".join(f"x.{x} = h.{x}" for x in self._key_columns)
+        on = " AND ".join(f"t.{x} = d.{x}" for x in self._key_columns)
+        first = self._key_columns[0]
+
+        with instrumentation.stage("upsert.delete"):
+            results = self._cursor.execute(
+                f"DELETE FROM {self._table_name} t USING ("
+                f"SELECT {keys} FROM {self._table_name} x LEFT JOIN {self._hash_table} h ON {missing} "
+                f"WHERE h.{first} IS NULL) d WHERE {on};")
+            self.counts["deleted"] = results.fetchone()[0]
+        instrumentation.query("upsert.delete", results)
+
+    def finish(self):
+        if self._next is not None:
+            raise ValueError("The source changed between reading its hashes and its rows; run the upsert again")
+
+        self._flush(self._delta_table, self._columns + [HASH_COLUMN])
+        changed = self.counts["inserted"] + self.counts["updated"]
+        self.counts["unchanged"] = self._rows - changed
+        if changed:
+            self._merge()
+
+        if self._detect_deletes:
+            self._delete_missing()
+
+        self._cursor.execute(f"DROP TABLE IF EXISTS {self._delta_table};")
+        self._cursor.execute(f"DROP TABLE IF EXISTS {self._hash_table};")
+
+        arcpy.AddMessage(", ".join(f"{k}: {v}" for k, v in self.counts.items()))
+        return self.counts
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import functools
+import threading
+import arcpy
+
+
+# Set ARCSNOW_TRACE to get a per-stage summary in the tool messages and/or
+# ARCSNOW_TRACE_FILE to append a JSON trace line per tool run to that file.
+TRACE_VARIABLE = "ARCSNOW_TRACE"
+TRACE_FILE_VARIABLE = "ARCSNOW_TRACE_FILE"
+
+
+class Stage(object):
+    """Totals of one named stage across every time it ran."""
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, rows=0, nbytes=0):
+        self.rows += rows
+        self.bytes += nbytes
+
+    def as_dict(self):
+        return {"seconds": round(self.seconds, 4), "calls": self.calls, "rows": self.rows, "bytes": self.bytes}
+
+
+class _Timer(object):
+    def __init__(self, trace, name):
+        self._trace = trace
+        self._name = name
+        self._rows = 0
+        self._bytes = 0
+
+    def add(self, rows=0, nbytes=0):
+        self._rows += rows
+        self._bytes += nbytes
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._trace.record(self._name, time.perf_counter() - self._started, self._rows, self._bytes)
+        return False
+
+
+class _NullTimer(object):
+    def add(self, rows=0, nbytes=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Trace(object):
+    """Stage timings, row and byte counts and Snowflake query IDs of one
+    tool run. Stages may be recorded from worker threads."""
+
+    def __init__(self, tool, path=None):
+        self.tool = tool
+        self.path = path
+        self.started = time.time()
+        self.stages = {}
+        self.queries = []
+        self._clock = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows=0, nbytes=0):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = Stage(name)
+            stage.seconds += seconds
+            stage.calls += 1
+            stage.add(rows, nbytes)
+
+    def query(self, name, sfqid):
+        if sfqid:
+            with self._lock:
+                self.queries.append({"stage": name, "sfqid": sfqid})
+
+    def summary(self):
+        seconds = time.perf_counter() - self._clock
+        lines = [f"{self.tool} finished in {seconds:.2f}s"]
+        for stage in self.stages.values():
+            line = f"  {stage.name}: {stage.seconds:.3f}s over {stage.calls} call(s)"
+            if stage.rows:
+                line += f", {stage.rows} rows ({stage.rows / stage.seconds:,.0f}/s)" if stage.seconds else f", {stage.rows} rows"
+            if stage.bytes:
+                line += f", {stage.bytes / 1024 / 1024:.1f} MB"
+            lines.append(line)
+        if self.queries:
+            lines.append(f"  Query IDs: {', '.join(x['sfqid'] for x in self.queries)}")
+
+        return "\n".join(lines), seconds
+
+    def finish(self, error=None):
+        text, seconds = self.summary()
+        arcpy.AddMessage(text)
+
+        if self.path:
+            trace = {
+                "tool": self.tool,
+                "started": self.started,
+                "seconds": round(seconds, 4),
+                "error": repr(error) if error else None,
+                "stages": {x.name: x.as_dict() for x in self.stages.values()},
+                "queries": self.queries
+            }
+            try:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(trace) + "\n")
+            except OSError as e:
+                arcpy.AddWarning(f"Could not write trace file {self.path}: {e}")
+
+
+# The trace of the tool currently running, or None when tracing is off. Every
+# helper below is a single attribute check in that case.
+_trace = None
+
+
+def start(tool):
+    global _trace
+    path = os.environ.get(TRACE_FILE_VARIABLE)
+    _trace = Trace(tool, path) if path or os.environ.get(TRACE_VARIABLE) else None
+
+
+def finish(error=None):
+    global _trace
+    trace, _trace = _trace, None
+    if trace:
+        trace.finish(error)
+
+
+def stage(name):
+    """Context manager timing one run of a stage; call add(rows, nbytes) on
+    what it returns to count the rows and bytes it handled."""
+    if _trace is None:
+        return _NULL_TIMER
+    return _Timer(_trace, name)
+
+
+def query(name, cursor):
+    """Remember the query ID of the statement the cursor last ran."""
+    if _trace is not None:
+        _trace.query(name, getattr(cursor, "sfqid", None))
+
+
+def iterate(name, iterable, measure=None):
+    """Time how long each item of iterable takes to produce. measure(item)
+    returns the (rows, nbytes) the item accounts for."""
+    if _trace is None:
+        return iterable
+    return _iterate(_trace, name, iterable, measure)
+
+
+def _iterate(trace, name, iterable, measure):
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        rows, nbytes = measure(item) if measure else (0, 0)
+        trace.record(name, time.perf_counter() - started, rows, nbytes)
+        yield item
+
+
+def traced(execute):
+    """Decorator for a tool's execute method tracing the whole run under the
+    tool's class name."""
+    @functools.wraps(execute)
+    def wrapper(self, parameters, messages):
+        start(type(self).__name__)
+        try:
+            result = execute(self, parameters, messages)
+        except Exception as e:
+            finish(e)
+            raise
+        finish()
+        return result
+
+    return wrapper
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+from snowflake.connector.constants import FIELD_ID_TO_NAME
+
+
+# Size of one screen pixel at 96 DPI, in meters on the ground at a 1:1 scale.
+PIXEL_METERS = 0.0254 / 96
+
+
+def scale_tolerance(scale):
+    """Simplification tolerance, in meters, for drawing at 1:scale: vertices
+    closer than a screen pixel apart can't be told apart on the map."""
+    return scale * PIXEL_METERS
+
+
+def lod_name(out_name, scale):
+    return f"{out_name}_LOD{int(scale)}"
+
+
+def simplify_sql(sql, description, tolerance):
+    """Wrap the query so every GEOGRAPHY column is simplified by Snowflake
+    (tolerance in meters) before any vertex leaves the warehouse."""
+    columns = [x.name for x in description if FIELD_ID_TO_NAME[x.type_code] == "GEOGRAPHY"]
+    if not columns:
+        raise ValueError("The query returns no GEOGRAPHY column to simplify")
+
+    replace = ", ".join(f'ST_SIMPLIFY("{x}", {tolerance:.6g}) AS "{x}"' for x in columns)
+    query = sql.strip().rstrip(";").strip()
+    return f"SELECT * REPLACE ({replace}) FROM ({query})"
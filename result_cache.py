@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from snowflake.connector.cursor import ResultMetadata
+
+
+DEFAULT_LOCATION = os.path.join(tempfile.gettempdir(), "arcsnow_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_TTL = 24 * 60 * 60
+
+# Bump whenever the layout of cached results changes, e.g. the output
+# format of spatial columns, so older entries are never misread.
+CACHE_VERSION = "2"
+
+# Splits a statement into alternating unquoted / quoted segments so that
+# whitespace inside string literals and quoted identifiers is left alone.
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+def normalize_sql(sql):
+    parts = _QUOTED.split(sql.strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = " ".join(parts[i].split())
+
+    return "".join(parts).rstrip("; ")
+
+
+class CacheWriter(object):
+    """Write-through cache entry filled batch by batch during a download.
+
+    The entry only becomes visible once commit() renames it into place."""
+
+    def __init__(self, cache, key, description):
+        self._cache = cache
+        self._path = cache.entry_path(key)
+        self._tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        self._metadata = {
+            b"arcsnow.created": str(time.time()).encode(),
+            b"arcsnow.description": json.dumps([list(x) for x in description]).encode()
+        }
+        self._schema = None
+        self._sink = None
+        self._writer = None
+
+    def _open(self, schema):
+        self._schema = schema.with_metadata(self._metadata)
+        self._sink = pa.OSFile(self._tmp_path, "wb")
+        self._writer = pa.ipc.new_file(self._sink, self._schema)
+
+    def _normalize(self, table):
+        # Snowflake picks the narrowest integer width per result chunk, so
+        # widen integers to keep one schema across the whole entry.
+        columns = []
+        for column in table.columns:
+            if pa.types.is_integer(column.type) and column.type != pa.int64():
+                column = pc.cast(column, pa.int64())
+            columns.append(column)
+
+        return pa.Table.from_arrays(columns, names=table.column_names)
+
+    def write(self, table):
+        if not table.num_columns:
+            return
+
+        table = self._normalize(table)
+        if self._writer is None:
+            self._open(table.schema)
+
+        self._writer.write_table(table.cast(self._schema))
+
+    def commit(self):
+        if self._writer is None:
+            self._open(pa.schema([]))
+
+        self._writer.close()
+        self._sink.close()
+        os.replace(self._tmp_path, self._path)
+
+        self._cache.evict()
+
+    def discard(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class CacheEntry(object):
+    def __init__(self, path):
+        self._path = path
+        self._source = pa.memory_map(path, "r")
+        self._reader = pa.ipc.open_file(self._source)
+
+        metadata = self._reader.schema.metadata or {}
+        self.created = float(metadata.get(b"arcsnow.created", b"0"))
+        self.description = [ResultMetadata(*x) for x in json.loads(metadata.get(b"arcsnow.description", b"[]"))]
+
+    def batches(self):
+        # Batches are memory mapped, so only the batch being written is paged in.
+        for i in range(self._reader.num_record_batches):
+            yield self._reader.get_batch(i)
+
+    def close(self):
+        self._source.close()
+
+
+class ResultCache(object):
+    """Local, size-capped LRU cache of query results stored as Arrow IPC files."""
+
+    def __init__(self, location=DEFAULT_LOCATION, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.location = location
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        os.makedirs(self.location, exist_ok=True)
+
+    def key(self, sql, credentials):
+        context = [
+            CACHE_VERSION,
+            normalize_sql(sql),
+            credentials.account,
+            credentials.role,
+            credentials.warehouse,
+            credentials.database,
+            credentials.db_schema
+        ]
+        return hashlib.sha256("\x1f".join(context).encode()).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.location, f"{key}.arrow")
+
+    def get(self, key):
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            entry = CacheEntry(path)
+        except (OSError, pa.ArrowInvalid):
+            self._remove(path)
+            return None
+
+        if time.time() - entry.created > self.ttl:
+            entry.close()
+            self._remove(path)
+            return None
+
+        # The modification time doubles as the last-used time for LRU eviction.
+        os.utime(path)
+        return entry
+
+    def writer(self, key, description):
+        return CacheWriter(self, key, description)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.location):
+            if not name.endswith(".arrow"):
+                continue
+            stat = os.stat(os.path.join(self.location, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(x[1] for x in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.max_bytes and time.time() - mtime <= self.ttl:
+                continue
+            self._remove(os.path.join(self.location, name))
+            total -= size
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+
+CELL_COLUMN = "ARCSNOW_CELL"
+SCHEMES = ["NONE", "GEOHASH", "H3"]
+DEFAULT_RESOLUTION = {"GEOHASH": 6, "H3": 7}
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_LAT_NAMES = ("LAT", "LATITUDE", "Y", "POINT_Y")
+_LON_NAMES = ("LON", "LNG", "LONG", "LONGITUDE", "X", "POINT_X")
+
+
+def geohash(lat, lon, precision=DEFAULT_RESOLUTION["GEOHASH"]):
+    """Geohash of a WGS84 point; nearby points share long prefixes, so the
+    hashes sort into spatially compact runs."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            interval[0] = middle
+        else:
+            value = value * 2
+            interval[1] = middle
+
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+
+    return "".join(chars)
+
+
+def guess_lat_lon(names):
+    """(latitude, longitude) column names picked by name, or None for each."""
+    upper = {x.upper(): x for x in names}
+    lat = next((upper[x] for x in _LAT_NAMES if x in upper), None)
+    lon = next((upper[x] for x in _LON_NAMES if x in upper), None)
+    return lat, lon
+
+
+def column_sql():
+    return f"{CELL_COLUMN} VARCHAR(16)"
+
+
+def prepare_sql(table_name):
+    """Statements giving an existing table the cell column as its clustering key."""
+    return [
+        f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column_sql()};",
+        f"ALTER TABLE {table_name} CLUSTER BY ({CELL_COLUMN});"
+    ]
+
+
+def recluster_sql(table_name):
+    """Rewrite the whole table in cell order, so micro-partitions hold
+    compact areas right away instead of after automatic clustering."""
+    return f"INSERT OVERWRITE INTO {table_name} SELECT * FROM {table_name} ORDER BY {CELL_COLUMN};"
+
+
+class CellKey(object):
+    """Spatial cell of a WGS84 point, as a geohash or an H3 index. H3 needs
+    the optional h3 package."""
+
+    def __init__(self, scheme="GEOHASH", resolution=None):
+        self.scheme = scheme.upper()
+        self.resolution = resolution or DEFAULT_RESOLUTION[self.scheme]
+
+        if self.scheme == "H3":
+            try:
+                import h3
+            except ImportError:
+                raise ValueError("The H3 cell key needs the h3 package; install it or use GEOHASH")
+            # h3 4.x renamed geo_to_h3
+            self._h3 = getattr(h3, "latlng_to_cell", None) or h3.geo_to_h3
+
+    def cell(self, lat, lon):
+        if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+            return None
+        if self.scheme == "H3":
+            return self._h3(lat, lon, self.resolution)
+        return geohash(lat, lon, self.resolution)
+
+    def cells(self, lats, lons):
+        return [self.cell(lat, lon) for lat, lon in zip(lats, lons)]
+
+    def __str__(self):
+        return f"{self.scheme} {self.resolution}"
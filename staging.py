@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import uuid
+import itertools
+import shutil
+import tempfile
+import instrumentation
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# COPY INTO accepts at most this many names in its FILES list.
+MAX_COPY_FILES = 1000
+
+
+def table_stage(table_name):
+    """Return the table stage of a (possibly qualified) table name,
+    e.g. "DB"."SCHEMA"."T" -> @"DB"."SCHEMA".%"T"."""
+    if "." in table_name:
+        prefix, name = table_name.rsplit(".", 1)
+        return f"@{prefix}.%{name}"
+
+    return f"@%{table_name}"
+
+
+class StageLoader(object):
+    """Load data into a Snowflake table through its table stage.
+
+    Each chunk is written locally as a compressed Parquet file, PUT to the
+    table stage and removed locally; copy() then loads every staged file
+    with a single COPY INTO, so the cost grows linearly with the data.
+    put() may be called from several threads at once.
+
+    An optional chunking.AdaptiveChunker and chunking.CodecChooser are told
+    how long each chunk took to encode and upload, and the chooser's codec
+    replaces `compression` for the following chunks.
+
+    Staged files stay in the table stage until they are loaded, so with a
+    fixed `prefix` and numbered chunks an interrupted upload can resume()
+    with the files an earlier run staged."""
+
+    def __init__(self, cursor, table_name, compression="snappy", chunker=None, codecs=None, prefix=None):
+        self._cursor = cursor
+        self._table_name = table_name
+        self._stage = table_stage(table_name)
+        self._compression = compression
+        self._chunker = chunker
+        self._codecs = codecs
+        self._location = tempfile.mkdtemp(prefix="arcsnow_")
+        self._prefix = prefix or uuid.uuid4().hex
+        self._counter = itertools.count()
+        self._files = []
+
+    def put(self, data, index=None):
+        """Stage one chunk, given as a DataFrame or an Arrow table, and
+        return its file name in the stage."""
+        if not isinstance(data, pa.Table):
+            data = pa.Table.from_pandas(data, preserve_index=False)
+
+        index = next(self._counter) if index is None else index
+        file_name = f"{self._prefix}_{index:06d}.parquet"
+        path = os.path.join(self._location, file_name)
+
+        compression = self._codecs.codec if self._codecs else self._compression
+
+        # Snowflake reads Parquet timestamps at microsecond precision.
+        started = time.perf_counter()
+        with instrumentation.stage("stage.parquet") as timer:
+            pq.write_table(data, path, compression=compression, coerce_timestamps="us", allow_truncated_timestamps=True)
+            timer.add(data.num_rows, data.nbytes)
+        encoded = time.perf_counter()
+
+        try:
+            # Cursors are not shareable between threads, so each PUT gets its own.
+            file_url = path.replace("\\", "/")
+            with instrumentation.stage("stage.put") as timer:
+                cursor = self._cursor.connection.cursor()
+                cursor.execute(f"PUT 'file://{file_url}' {self._stage} AUTO_COMPRESS=FALSE OVERWRITE=TRUE;")
+                timer.add(data.num_rows, os.path.getsize(path))
+            instrumentation.query("stage.put", cursor)
+        finally:
+            os.remove(path)
+
+        uploaded = time.perf_counter()
+        if self._chunker:
+            self._chunker.observe(data.nbytes, uploaded - started)
+        if self._codecs:
+            self._codecs.observe(encoded - started, uploaded - encoded)
+
+        self._files.append(file_name)
+        return file_name
+
+    def resume(self, file_names):
+        """Include files staged by an earlier run in the next copy()."""
+        self._files.extend(file_names)
+
+    def remove(self, file_names):
+        """Delete staged files that will not be loaded."""
+        for file_name in file_names:
+            self._cursor.execute(f"REMOVE {self._stage}/{file_name};")
+
+    def copy(self, on_loaded=None):
+        """COPY every staged chunk into the table and return the rows loaded.
+
+        Snowflake's load metadata skips files it has already loaded, so
+        copying a file again after a failure does not duplicate its rows.
+        `on_loaded` is called with the file names of every finished COPY."""
+        rows = 0
+        for start in range(0, len(self._files), MAX_COPY_FILES):
+            files = ",".join(f"'{x}'" for x in self._files[start:start + MAX_COPY_FILES])
+            with instrumentation.stage("stage.copy") as timer:
+                results = self._cursor.execute(
+                    f"COPY INTO {self._table_name} FROM {self._stage} FILES = ({files}) "
+                    f"FILE_FORMAT = (TYPE = PARQUET) MATCH_BY_COLUMN_NAME = CASE_SENSITIVE PURGE = TRUE;")
+
+                # One result row per file: (file, status, rows_parsed, rows_loaded, ...)
+                loaded = sum(int(x[3]) for x in results if len(x) > 3)
+                timer.add(loaded)
+            instrumentation.query("stage.copy", self._cursor)
+            rows += loaded
+            if on_loaded:
+                on_loaded(self._files[start:start + MAX_COPY_FILES])
+
+        self._files = []
+        return rows
+
+    def close(self):
+        shutil.rmtree(self._location, ignore_errors=True)
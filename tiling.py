@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+
+DEFAULT_TILE_DEGREES = 1.0
+SPATIAL_TYPES = ("GEOGRAPHY", "GEOMETRY")
+
+
+def spatial_column(description, name=None):
+    """Return the (name, type name) of the column to filter on: the one
+    called name, or else the first GEOGRAPHY or GEOMETRY column."""
+    from snowflake.connector.constants import FIELD_ID_TO_NAME
+
+    for column in description:
+        type_name = FIELD_ID_TO_NAME[column.type_code]
+        if type_name not in SPATIAL_TYPES:
+            continue
+        if name is None or column.name.upper() == name.strip('"').upper():
+            return column.name, type_name
+
+    raise ValueError(f"The query returns no GEOGRAPHY or GEOMETRY column{f' named {name}' if name else ''}")
+
+
+def geometry_srid(cursor, sql, column):
+    """SRID of a GEOMETRY column, read from its first non-null value."""
+    query = sql.strip().rstrip(";").strip()
+    row = cursor.execute(f'SELECT ST_SRID("{column}") FROM ({query}) WHERE "{column}" IS NOT NULL LIMIT 1;').fetchone()
+    return row[0] if row and row[0] is not None else 4326
+
+
+def _longitudes(xmin, xmax):
+    """Longitude ranges of an extent, split in two where it crosses the
+    antimeridian, whether given as xmin > xmax or past +-180."""
+    if xmin > xmax:
+        xmax += 360
+    if xmax - xmin >= 360:
+        return [(-180.0, 180.0)]
+
+    shift = math.floor((xmin + 180) / 360) * 360
+    xmin, xmax = xmin - shift, xmax - shift
+    if xmax <= 180:
+        return [(xmin, xmax)]
+    return [(xmin, 180.0), (-180.0, xmax - 360)]
+
+
+def tile_grid(xmin, ymin, xmax, ymax, size=DEFAULT_TILE_DEGREES):
+    """Bounds of the tiles of a global lon/lat grid covering the extent,
+    row by row.
+
+    Tiles are aligned to the grid rather than to the extent, so overlapping
+    extents produce identical tiles and identical (cacheable) queries."""
+    ymin, ymax = max(ymin, -90.0), min(ymax, 90.0)
+    if ymin >= ymax:
+        return []
+
+    tiles = []
+    for row in range(math.floor((ymin + 90) / size), math.ceil((ymax + 90) / size)):
+        for low, high in _longitudes(xmin, xmax):
+            for column in range(math.floor((low + 180) / size), math.ceil((high + 180) / size)):
+                tiles.append((
+                    -180 + column * size,
+                    -90 + row * size,
+                    min(-180 + (column + 1) * size, 180.0),
+                    min(-90 + (row + 1) * size, 90.0)))
+
+    return tiles
+
+
+def _shape(wkt, type_name, srid):
+    """SQL for a lon/lat polygon given as a WKT expression, in the type and
+    SRID of the filtered column."""
+    if type_name == "GEOGRAPHY":
+        return f"TO_GEOGRAPHY({wkt})"
+    if srid in (0, 4326):
+        return f"TO_GEOMETRY({wkt}, {srid})"
+    # The tile is projected once to the column's coordinate system.
+    return f"ST_TRANSFORM(TO_GEOMETRY({wkt}, 4326), {srid})"
+
+
+def _cell(column, type_name, size, srid):
+    """SQL for the grid (column, row) of the tile holding a shape's centroid."""
+    centroid = f'ST_CENTROID("{column}")'
+    if type_name == "GEOMETRY" and srid not in (0, 4326):
+        centroid = f"ST_TRANSFORM({centroid}, 4326)"
+
+    # Centroids on the east or north edge of the world belong to the last tile.
+    columns, rows = math.ceil(360 / size) - 1, math.ceil(180 / size) - 1
+    return (f"LEAST(FLOOR((ST_X({centroid}) + 180) / {size:.10g}), {columns})",
+            f"LEAST(FLOOR((ST_Y({centroid}) + 90) / {size:.10g}), {rows})")
+
+
+def tile_sql(sql, column, type_name, bounds, size=DEFAULT_TILE_DEGREES, srid=4326):
+    """Wrap the query with an ST_INTERSECTS filter on the tile polygon so
+    Snowflake can prune micro-partitions outside of it.
+
+    A feature crossing tile boundaries intersects several tiles. It is only
+    returned by the tile of the global grid holding its centroid, so the
+    query depends on nothing but the tile and the same tile is cached
+    whatever the extent around it. Features whose centroid lies outside the
+    extent are left out. A feature that misses the tile of its own centroid,
+    e.g. a C shaped polygon, is returned by every tile it touches instead."""
+    xmin, ymin, xmax, ymax = (f"{x:.10g}" for x in bounds)
+    wkt = f"'POLYGON(({xmin} {ymin},{xmax} {ymin},{xmax} {ymax},{xmin} {ymax},{xmin} {ymin}))'"
+
+    x, y = _cell(column, type_name, size, srid)
+    x0, y0 = f"(-180 + {x} * {size:.10g})", f"(-90 + {y} * {size:.10g})"
+    x1, y1 = f"LEAST({x0} + {size:.10g}, 180)", f"LEAST({y0} + {size:.10g}, 90)"
+    cell = (f"'POLYGON((' || {x0} || ' ' || {y0} || ',' || {x1} || ' ' || {y0} || ',' || {x1} || ' ' || {y1} || ',' "
+            f"|| {x0} || ' ' || {y1} || ',' || {x0} || ' ' || {y0} || '))'")
+
+    owner = (f"({x} = {round((bounds[0] + 180) / size)} AND {y} = {round((bounds[1] + 90) / size)} "
+             f'OR NOT ST_INTERSECTS("{column}", {_shape(cell, type_name, srid)}))')
+
+    query = sql.strip().rstrip(";").strip()
+    return f'SELECT * FROM ({query}) WHERE ST_INTERSECTS("{column}", {_shape(wkt, type_name, srid)}) AND {owner}'
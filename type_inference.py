@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+
+# Snowflake column types for arcpy field types. Geodatabase integers and
+# dates have fixed ranges, so their columns can be declared exactly.
+FIELD_TYPES = {
+    "SmallInteger": "NUMBER(5,0)",
+    "Integer": "NUMBER(10,0)",
+    "BigInteger": "NUMBER(19,0)",
+    "Single": "FLOAT",
+    "Double": "FLOAT",
+    "String": "VARCHAR",
+    "Date": "TIMESTAMP_NTZ",
+    "DateOnly": "DATE",
+    "TimeOnly": "TIME",
+    "TimestampOffset": "TIMESTAMP_TZ",
+    "GUID": "VARCHAR(38)",
+    "GlobalID": "VARCHAR(38)",
+    "Geometry": "GEOGRAPHY"
+}
+
+# Types offered for CSV field definitions; INT, DOUBLE and DATETIME are kept
+# so definitions saved by earlier versions still validate.
+DEFINITION_TYPES = ["NUMBER", "FLOAT", "VARCHAR", "BOOLEAN", "DATE", "TIMESTAMP_NTZ", "INT", "DOUBLE", "DATETIME"]
+
+# Precision steps for NUMBER columns and length steps for VARCHAR columns.
+PRECISIONS = (9, 18, 38)
+VARCHAR_LENGTHS = (16, 32, 64, 128, 255, 512, 1024, 4096, 16384, 65536, 16777216)
+# Decimal places tried before a float column is left as FLOAT.
+MAX_SCALE = 6
+
+# Timestamp formats the CSV parser accepts besides ISO 8601; a column is only
+# inferred as a date when every sampled value matches one of them.
+TIMESTAMP_FORMATS = ["%m/%d/%Y", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S"]
+# The ISO 8601 values Arrow parses into a timestamp without a time zone.
+ISO_TIMESTAMP = r"\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d{1,9})?)?)?"
+
+TRUE_VALUES = ["true", "True", "TRUE", "t", "T", "yes", "Yes", "YES", "y", "Y"]
+FALSE_VALUES = ["false", "False", "FALSE", "f", "F", "no", "No", "NO", "n", "N"]
+
+
+def field_type(field):
+    """Snowflake type of an arcpy field, or None if it isn't transferred.
+    Decimal widths declared on the field (enterprise geodatabases) are kept."""
+    type_name = FIELD_TYPES.get(field.type)
+    if type_name is None:
+        return None
+
+    precision = getattr(field, "precision", 0) or 0
+    scale = getattr(field, "scale", 0) or 0
+    if field.type in ("Single", "Double") and 0 < precision <= 38 and scale > 0:
+        return f"NUMBER({precision},{scale})"
+    if field.type == "String" and field.length:
+        return f"VARCHAR({field.length})"
+
+    return type_name
+
+
+def field_column(field):
+    """Column definition of an arcpy field for CREATE TABLE."""
+    not_null = "" if getattr(field, "isNullable", True) else " NOT NULL"
+    return f"{field.name} {field_type(field)}{not_null}"
+
+
+def _step(value, steps):
+    for step in steps:
+        if value <= step:
+            return step
+    return steps[-1]
+
+
+def _digits(value):
+    return len(str(int(abs(value)))) if value else 1
+
+
+def _scale(values):
+    """Fewest decimal places that represent every value, or None."""
+    for scale in range(MAX_SCALE + 1):
+        scaled = values * 10 ** scale
+        if ((scaled - scaled.round()).abs() < 1e-6).all():
+            return scale
+    return None
+
+
+def _is_bool(values):
+    text = set(values.astype(str).unique())
+    return bool(text) and text <= set(TRUE_VALUES + FALSE_VALUES)
+
+
+def infer_column(series, complete=False):
+    """[type, length, scale, nullable] for a sample of a CSV column.
+
+    NUMBER columns carry their precision in length. The types are enforced
+    on every row of the file, so unless `complete` says the sample was the
+    whole file they are widened: whole numbers become NUMBER(38,0), numbers
+    with fractions FLOAT, text an unbounded VARCHAR and every column
+    nullable."""
+    import pandas as pd
+
+    values = series.dropna()
+    nullable = len(values) < len(series) or not complete
+
+    if values.empty:
+        return ["VARCHAR", None, None, True]
+
+    if pd.api.types.is_bool_dtype(values):
+        return ["BOOLEAN", None, None, nullable]
+
+    if not complete and (pd.api.types.is_integer_dtype(values) or pd.api.types.is_float_dtype(values)):
+        # A later row may hold more digits, or more decimals.
+        if pd.api.types.is_integer_dtype(values) or _scale(values) == 0:
+            return ["NUMBER", PRECISIONS[-1], 0, nullable]
+        return ["FLOAT", None, None, nullable]
+
+    if pd.api.types.is_integer_dtype(values):
+        digits = max(_digits(values.min()), _digits(values.max()))
+        return ["NUMBER", _step(digits + 1, PRECISIONS), 0, nullable]
+
+    if pd.api.types.is_float_dtype(values):
+        scale = _scale(values) if values.abs().max() < 10 ** (38 - MAX_SCALE) else None
+        if scale is None:
+            return ["FLOAT", None, None, nullable]
+        digits = max(_digits(values.min()), _digits(values.max()))
+        return ["NUMBER", _step(digits + scale + 1, PRECISIONS), scale, nullable]
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return [_date_type(values), None, None, nullable]
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(str)
+
+    if _is_bool(values):
+        return ["BOOLEAN", None, None, nullable]
+
+    text = values.astype(str)
+    parsed = _parse_dates(text)
+    if parsed is not None:
+        return [_date_type(parsed), None, None, nullable]
+
+    if not complete:
+        return ["VARCHAR", None, None, nullable]
+
+    # Twice the longest value seen, rounded up to a common length.
+    return ["VARCHAR", _step(2 * int(text.str.len().max()), VARCHAR_LENGTHS), None, nullable]
+
+
+def _parse_dates(text):
+    """The values as timestamps if each one is in a format the CSV parser
+    reads, ISO 8601 or TIMESTAMP_FORMATS, else None."""
+    import pandas as pd
+
+    iso = text.str.fullmatch(ISO_TIMESTAMP)
+    parsed = pd.to_datetime(text.where(iso), format="ISO8601", errors="coerce")
+    for fmt in TIMESTAMP_FORMATS:
+        if parsed.notna().all():
+            break
+        parsed = parsed.fillna(pd.to_datetime(text.where(parsed.isna()), format=fmt, errors="coerce"))
+
+    return parsed if parsed.notna().all() else None
+
+
+def _date_type(values):
+    values = values.dt.tz_localize(None) if values.dt.tz is not None else values
+    return "DATE" if (values == values.dt.normalize()).all() else "TIMESTAMP_NTZ"
+
+
+def _nullable(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return value is None or bool(value)
+
+
+def column_type(definition):
+    """SQL type of a [name, type, length, nullable(, scale)] field definition."""
+    base = definition[1].split("(")[0].upper()
+    length = definition[2] if len(definition) > 2 else None
+    scale = definition[4] if len(definition) > 4 and definition[4] is not None else 0
+
+    if base == "NUMBER":
+        return f"NUMBER({int(length)},{int(scale)})" if length else "NUMBER(38,0)"
+    if base == "VARCHAR" and length:
+        return f"VARCHAR({int(length)})"
+
+    return base
+
+
+def definition_column(definition):
+    """Column definition of a CSV field definition for CREATE TABLE."""
+    nullable = _nullable(definition[3]) if len(definition) > 3 else True
+    return f'"{definition[0]}" {column_type(definition)}{"" if nullable else " NOT NULL"}'
+
+
+def arrow_type(definition):
+    """Arrow type a CSV column is parsed as, or None to let Arrow infer it.
+    DATE columns are parsed as timestamps so every timestamp format is
+    accepted, and cast to dates afterwards."""
+    import pyarrow as pa
+
+    base = definition[1].split("(")[0].upper()
+    sql_type = column_type(definition)
+
+    if base == "NUMBER":
+        precision, scale = (int(x) for x in sql_type[7:-1].split(","))
+        if scale == 0 and precision <= 18:
+            return pa.int64()
+        return pa.decimal128(precision, scale)
+    if base == "INT":
+        return pa.int64()
+    if base in ("FLOAT", "DOUBLE"):
+        return pa.float64()
+    if base == "VARCHAR":
+        return pa.string()
+    if base == "BOOLEAN":
+        return pa.bool_()
+    if base in ("DATE", "DATETIME", "TIMESTAMP_NTZ"):
+        return pa.timestamp("us")
+
+    return None
@@ -1,8 +1,12 @@
 import os
 import sys
 import csv
+import time
 import arcpy
 import arcsnow as asn
+import instrumentation
+
+from collections import deque
 
 class update_comment(object):
     def __init__(self):
@@ -11,6 +15,11 @@ class update_comment(object):
         self.description = "Update column comments from CSV exported from Dataedo"
         self.canRunInBackground = False
         self.category = "Dataedo"
+
+        # Columns changed per ALTER TABLE statement and statements running at once
+        self.max_columns = 100
+        self.max_running = 16
+        self.poll_interval = 0.5
     
     def getParameterInfo(self):
         """Define parameter definitions"""
@@ -35,28 +44,176 @@ class update_comment(object):
             parameterType="Derived",
             direction="Output")
             
-        return [credentials, in_table, success]
+        # 3
+        applied = arcpy.Parameter(
+            displayName="Applied",
+            name="applied",
+            datatype="GPLong",
+            parameterType="Derived",
+            direction="Output")
+
+        # 4
+        unchanged = arcpy.Parameter(
+            displayName="Unchanged",
+            name="unchanged",
+            datatype="GPLong",
+            parameterType="Derived",
+            direction="Output")
+
+        # 5
+        failed = arcpy.Parameter(
+            displayName="Failed",
+            name="failed",
+            datatype="GPLong",
+            parameterType="Derived",
+            direction="Output")
+
+        return [credentials, in_table, success, applied, unchanged, failed]
         
     def updateParameters(self, parameters):
         return
     
-    def execute(self, parameters, messages):
-        arcsnow = asn.ArcSnow(parameters[0].valueAsText)
-        arcsnow.login()
-        
-        csv_file_path = parameters[1].valueAsText
+    def _read_comments(self, csv_file_path):
+        """Return {table: {column: comment}} from the Dataedo export."""
+        comments = {}
+
         with open(csv_file_path, "r") as csvfile:
             csv_reader = csv.reader(csvfile)
             next(csv_reader)
-            
+
             table_index = 1
             column_index = 5
             comment_index = 15
-            
+
             for row in csv_reader:
-                table_name = row[table_index]
-                column_name = row[column_index]
-                comment = row[comment_index]
-                
-                sql = f"COMMENT ON COLUMN {table_name}.{column_name} IS '{comment}';"
-                arcsnow.cursor.execute(sql)
+                comments.setdefault(row[table_index], {})[row[column_index]] = row[comment_index]
+
+        return comments
+
+    def _qualify(self, table_name, database, schema):
+        """(database, schema, table) of a table name as given in the export,
+        filling in the session's database and schema where they are left out."""
+        parts = [x.strip('"').upper() for x in table_name.split(".")]
+        return tuple([database, schema][:3 - len(parts)] + parts)
+
+    def _current_comments(self, cursor, tables):
+        """Read the column comments and the object type of the given
+        (database, schema, table) names, in one query per database."""
+        schemas = {}
+        for database, schema, table in tables:
+            # Without a database in use unqualified names cannot be looked up.
+            if database is None:
+                continue
+            schemas.setdefault(database, set()).add(schema)
+
+        comments = {}
+        types = {}
+        for database, names in schemas.items():
+            binds = ",".join("?" for x in names)
+            results = cursor.execute(f"""SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME, c.COMMENT, t.TABLE_TYPE \
+            FROM "{database}".INFORMATION_SCHEMA.COLUMNS c \
+            JOIN "{database}".INFORMATION_SCHEMA.TABLES t ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME \
+            WHERE c.TABLE_SCHEMA IN ({binds})""", sorted(names))
+
+            for schema, table, column, comment, table_type in results:
+                key = (database, schema.upper(), table.upper())
+                comments[key + (column.upper(),)] = comment or ""
+                types[key] = table_type
+
+        return comments, types
+
+    def _quote(self, comment):
+        return "'" + comment.replace("\\", "\\\\").replace("'", "''") + "'"
+
+    def _statement(self, table_name, columns, comment_on=False):
+        # Views only take COMMENT ON COLUMN, one column per statement.
+        if comment_on:
+            column, comment = columns[0]
+            return f"COMMENT ON COLUMN {table_name}.{column} IS {self._quote(comment)};"
+
+        changes = ", ".join(f"COLUMN {column} COMMENT {self._quote(comment)}" for column, comment in columns)
+        return f"ALTER TABLE {table_name} MODIFY {changes};"
+
+    def _submit(self, conn, statements):
+        """Run the statements asynchronously, a bounded number at a time, and
+        return the applied and failed column counts."""
+        from snowflake.connector.errors import ProgrammingError
+
+        applied = 0
+        failed = 0
+        pending = deque(statements)
+        running = {}
+
+        while pending or running:
+            while pending and len(running) < self.max_running:
+                table_name, columns, comment_on = pending.popleft()
+                cursor = conn.cursor()
+                cursor.execute_async(self._statement(table_name, columns, comment_on))
+                instrumentation.query("alter", cursor)
+                running[cursor.sfqid] = (table_name, columns, comment_on)
+
+            time.sleep(self.poll_interval)
+
+            for query_id in list(running):
+                try:
+                    status = conn.get_query_status_throw_if_error(query_id)
+                except ProgrammingError as e:
+                    table_name, columns, comment_on = running.pop(query_id)
+                    if len(columns) > 1:
+                        # Retry column by column so one bad name doesn't sink the rest.
+                        pending.extend((table_name, [x], False) for x in columns)
+                    elif not comment_on:
+                        # Objects that are not tables may still take COMMENT ON COLUMN.
+                        pending.append((table_name, columns, True))
+                    else:
+                        arcpy.AddWarning(f"{table_name}.{columns[0][0]}: {e.msg}")
+                        failed += 1
+                    continue
+
+                if not conn.is_still_running(status):
+                    applied += len(running.pop(query_id)[1])
+
+        return applied, failed
+
+    @instrumentation.traced
+    def execute(self, parameters, messages):
+        arcsnow = asn.ArcSnow(parameters[0].valueAsText)
+        arcsnow.login()
+
+        with instrumentation.stage("read"):
+            comments = self._read_comments(parameters[1].valueAsText)
+        database, schema = arcsnow.cursor.execute("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA();").fetchone()
+        tables = {x: self._qualify(x, database, schema) for x in comments}
+        with instrumentation.stage("comments"):
+            current, types = self._current_comments(arcsnow.cursor, set(tables.values()))
+
+        # Only columns whose comment differs are sent, grouped per table.
+        statements = []
+        unchanged = 0
+        for table_name, columns in comments.items():
+            changed = []
+            for column_name, comment in columns.items():
+                if current.get(tables[table_name] + (column_name.strip('"').upper(),)) == comment:
+                    unchanged += 1
+                else:
+                    changed.append((column_name, comment))
+
+            if "VIEW" in (types.get(tables[table_name]) or ""):
+                statements += [(table_name, [x], True) for x in changed]
+                continue
+
+            for start in range(0, len(changed), self.max_columns):
+                statements.append((table_name, changed[start:start + self.max_columns], False))
+
+        arcpy.AddMessage(f"{len(statements)} comment statements to run")
+        with instrumentation.stage("alter") as timer:
+            applied, failed = self._submit(arcsnow.conn, statements)
+            timer.add(applied)
+
+        arcpy.AddMessage(f"Applied: {applied}, unchanged: {unchanged}, failed: {failed}")
+        parameters[2].value = failed == 0
+        parameters[3].value = applied
+        parameters[4].value = unchanged
+        parameters[5].value = failed
+
+        arcsnow.logout()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import os
+import datetime
+
+import arcpy
+import pyarrow.compute as pc
+
+from snowflake.connector.constants import FIELD_ID_TO_NAME
+
+
+# Side table in the output geodatabase holding one mark per synced table.
+SYNC_TABLE = "ARCSNOW_SYNC"
+NUMERIC_TYPES = ("FIXED", "REAL")
+
+_SYNC_FIELDS = [
+    ["TABLE_NAME", "TEXT", "Table", 255],
+    ["MARK_COLUMN", "TEXT", "Watermark Column", 255],
+    ["MARK_VALUE", "TEXT", "Watermark", 255],
+    ["MARK_TYPE", "TEXT", "Watermark Type", 32],
+    ["UPDATED", "DATE", "Updated", None]
+]
+
+
+def mark_column(description, name):
+    """Return the (index, name, type name) of the watermark column."""
+    for index, column in enumerate(description):
+        if column.name.upper() == name.strip('"').upper():
+            return index, column.name, FIELD_ID_TO_NAME[column.type_code]
+
+    raise ValueError(f"The query returns no column named {name}")
+
+
+def max_value(table, index):
+    """Largest non-null value of a column of an Arrow table, or None."""
+    return pc.max(table.column(index)).as_py()
+
+
+def mark_text(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def delta_sql(sql, column, type_name, value):
+    """Wrap the query so it only returns rows past the stored mark."""
+    if type_name in NUMERIC_TYPES:
+        literal = value
+    else:
+        literal = "'" + value.replace("'", "''") + "'"
+
+    query = sql.strip().rstrip(";").strip()
+    return f'SELECT * FROM ({query}) WHERE "{column}" > {literal}'
+
+
+class Watermarks(object):
+    """High-water marks of the tables synced into one geodatabase.
+
+    Each mark is the largest value of a timestamp or sequence column seen
+    by the last sync, kept as text in SYNC_TABLE next to the tables."""
+
+    def __init__(self, out_database):
+        self._path = os.path.join(out_database, SYNC_TABLE)
+        self._out_database = out_database
+
+    def _where(self, table_name):
+        escaped = table_name.replace("'", "''")
+        return f"TABLE_NAME = '{escaped}'"
+
+    def get(self, table_name):
+        """(column, value, type name) of the table's mark, or None."""
+        if not arcpy.Exists(self._path):
+            return None
+
+        with arcpy.da.SearchCursor(self._path, ["MARK_COLUMN", "MARK_VALUE", "MARK_TYPE"], self._where(table_name)) as SC:
+            for row in SC:
+                return row
+
+        return None
+
+    def set(self, table_name, column, value, type_name):
+        if not arcpy.Exists(self._path):
+            arcpy.management.CreateTable(self._out_database, SYNC_TABLE)
+            arcpy.management.AddFields(self._path, _SYNC_FIELDS)
+
+        row = [column, mark_text(value), type_name, datetime.datetime.now()]
+        with arcpy.da.UpdateCursor(self._path, ["MARK_COLUMN", "MARK_VALUE", "MARK_TYPE", "UPDATED"], self._where(table_name)) as UC:
+            for existing in UC:
+                UC.updateRow(row)
+                return
+
+        with arcpy.da.InsertCursor(self._path, ["TABLE_NAME", "MARK_COLUMN", "MARK_VALUE", "MARK_TYPE", "UPDATED"]) as IC:
+            IC.insertRow([table_name] + row)
+
+    def clear(self, table_name):
+        if not arcpy.Exists(self._path):
+            return
+
+        with arcpy.da.UpdateCursor(self._path, ["TABLE_NAME"], self._where(table_name)) as UC:
+            for row in UC:
+                UC.deleteRow()